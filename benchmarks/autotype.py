@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''Micro-benchmarks of :py:func:`clime.util.autotype`.
+
+It compares the current classifier with the previous one, which tried
+``isdigit`` and then ``float`` in ``try/except`` for every string. ::
+
+    $ python benchmarks/autotype.py
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from clime.util import autotype, autotype_all
+
+def autotype_try(s):
+
+    if not isinstance(s, str):
+        return s
+
+    if s.isdigit():
+        return int(s)
+
+    try:
+        return float(s)
+    except ValueError:
+        return s
+
+CASES = [
+    ('int', '12345'),
+    ('negative int', '-12345'),
+    ('float', '3.14159'),
+    ('bool', 'true'),
+    ('string', 'hello'),
+    ('path', '/usr/local/bin'),
+]
+
+def best(stmt, number, repeat=5):
+    return min(timeit.repeat(stmt, number=number, repeat=repeat)) / number
+
+def main(number=200000):
+
+    print('%-14s %12s %12s' % ('case', 'try (ns)', 'current (ns)'))
+    for label, s in CASES:
+        print('%-14s %12.1f %12.1f' % (
+            label,
+            best(lambda: autotype_try(s), number) * 1e9,
+            best(lambda: autotype(s), number) * 1e9,
+        ))
+
+    vals = [s for _, s in CASES] * 1000
+    print()
+    print('%-14s %12s %12s' % ('batch', 'map (us)', 'all (us)'))
+    print('%-14s %12.1f %12.1f' % (
+        '%d values' % len(vals),
+        best(lambda: list(map(autotype, vals)), 50) * 1e6,
+        best(lambda: autotype_all(vals), 50) * 1e6,
+    ))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''The memory benchmarks of the built commands.
+
+It builds all of the commands of a :py:class:`clime.core.Program` and
+measures the memory allocated by `tracemalloc`:
+
+``distinct``
+    A program of the distinct functions.
+
+``aliased``
+    A program of the commands which share a few functions, like the tools
+    registered under several names.
+
+``repeated``
+    A second program of the same functions, like the programs of the plugins
+    in a long-running process. Only the memory of the second one is counted.
+
+Run it: ::
+
+    $ python benchmarks/memory.py --commands=10000
+
+It needs Python 3.4 or later for `tracemalloc`.
+'''
+
+from __future__ import print_function
+
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from clime.core import Program, start
+from synthetic import make_module
+from suite import git_revision
+
+def measure(build):
+    '''Measure the memory which is allocated by `build` and still alive.
+
+    :rtype: (bytes, the object built)
+    '''
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        obj = build()
+        gc.collect()
+        after, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return after - before, obj
+
+def build_all(obj):
+    prog = Program(obj, name='memory')
+    prog.build_commands()
+    return prog
+
+def iter_scenarios(n_commands, n_shared):
+    '''Yield the pairs of a scenario name and a function to build a program.'''
+
+    module = make_module(n_commands, n_args=5)
+    yield 'distinct', lambda: build_all(module)
+
+    shared_module = make_module(n_shared, n_args=5)
+    funcs = [getattr(shared_module, 'command_{}'.format(i)) for i in range(n_shared)]
+    aliases = dict(
+        ('tool_{}'.format(i), funcs[i % n_shared]) for i in range(n_commands)
+    )
+    yield 'aliased', lambda: build_all(aliases)
+
+    # keep the first program alive while the second one is measured
+    first = build_all(module)
+    yield 'repeated', lambda first=first: build_all(module)
+
+def main(commands=10000, shared=100, output=None):
+    '''Measure the memory of the programs which build all of their commands.
+
+    options:
+        -c=<int>, --commands=<int>  the commands of a program
+        -s=<int>, --shared=<int>    the functions of the aliased commands
+        -o=<str>, --output=<str>    write the results as JSON
+    '''
+
+    results = {}
+    for name, build in iter_scenarios(commands, shared):
+        size, prog = measure(build)
+        results[name] = {
+            'bytes': size,
+            'bytes_per_command': size / float(len(prog.commands)),
+        }
+        print('{:<10} {:>10.1f} KB {:>10.1f} B/command'.format(
+            name, size/1024.0, results[name]['bytes_per_command']
+        ))
+        del prog
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'commands': commands,
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    start({'main': main}, default='main', debug=True)
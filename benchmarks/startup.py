@@ -0,0 +1,307 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''The end-to-end startup benchmarks.
+
+It spawns real processes of the one-shot invocations, which are the most of
+the use of clime:
+
+``python``
+    ``python -c pass``, the floor of the interpreter.
+
+``convert``
+    ``python -m clime synthetic.py command_0 ...``
+
+``now``
+    ``python now.py command_0 ...``, a script with ``import clime.now``.
+
+``start``
+    ``python start.py command_0 ...``, a script calling ``clime.start()``.
+
+It records the wall time of each process, and the peak RSS and the breakdown
+of ``-X importtime`` in the separate runs. A result can be saved as the
+baseline and later results are checked against it::
+
+    $ python benchmarks/startup.py --output=baseline.json
+    $ python benchmarks/startup.py --baseline=baseline.json
+
+It exits with status 1 if a scenario regresses.
+
+The peak RSS is measured by GNU ``time -f %M``. The `ru_maxrss` of a child,
+from `os.wait4` or `resource.getrusage`, is at least the RSS of its parent at
+`fork`, even with `posix_spawn`, so it can't be measured from a Python
+process, which is bigger than ``python -c pass``. Without GNU ``time``, the
+peak RSS isn't measured.
+'''
+
+from __future__ import print_function
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+import clime
+from synthetic import make_source, make_argv
+
+SCRIPT_TEMPLATES = {
+    'convert': '{source}',
+    'now': '{source}\nimport clime.now\n',
+    'start': 'import clime\n\n{source}\nif __name__ == \'__main__\':\n    clime.start()\n',
+}
+
+importtime_re = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(.+?)\s*$')
+
+def summarize(samples):
+    '''Summarize a list of numbers.
+
+    :rtype: dict of min, median, mean, stdev, p90 and max
+    '''
+
+    samples = sorted(samples)
+    n = len(samples)
+    mean = sum(samples) / float(n)
+    stdev = math.sqrt(sum((x-mean)**2 for x in samples) / (n-1)) if n > 1 else 0.0
+    if n % 2:
+        median = samples[n//2]
+    else:
+        median = (samples[n//2-1]+samples[n//2]) / 2.0
+    return {
+        'min': samples[0],
+        'median': median,
+        'mean': mean,
+        'stdev': stdev,
+        'p90': samples[min(n-1, int(math.ceil(n*0.9))-1)],
+        'max': samples[-1],
+    }
+
+TIME_PATHS = ('/usr/bin/time', '/bin/time', '/usr/local/bin/time')
+'''The paths to find GNU ``time``.'''
+
+def find_time():
+    '''Find GNU ``time``, which supports ``-f %M``.
+
+    :rtype: the path or None
+    '''
+
+    for path in TIME_PATHS:
+        if not os.access(path, os.X_OK):
+            continue
+        try:
+            with open(os.devnull, 'w') as devnull:
+                status = subprocess.call(
+                    [path, '-f', '%M', 'true'],
+                    stdout=devnull, stderr=devnull
+                )
+        except OSError:
+            continue
+        if status == 0:
+            return path
+
+    return None
+
+def spawn(argv, env):
+    '''Run `argv` and wait for it.
+
+    :rtype: a tuple of the wall seconds and the stderr
+    '''
+
+    with open(os.devnull, 'w') as devnull:
+        start_time = time.time()
+        proc = subprocess.Popen(argv, env=env, stdout=devnull, stderr=subprocess.PIPE)
+        stderr = proc.stderr.read()
+        proc.wait()
+        elapsed = time.time() - start_time
+        proc.stderr.close()
+
+    stderr = stderr.decode('utf-8', 'replace')
+    if proc.returncode:
+        raise RuntimeError('{} failed:\n{}'.format(' '.join(argv), stderr))
+
+    return elapsed, stderr
+
+def measure_maxrss(time_path, argv, env, dir_path):
+    '''Run `argv` by GNU ``time`` and get its peak RSS.
+
+    :rtype: the peak RSS in KB
+    '''
+
+    path = os.path.join(dir_path, 'maxrss.txt')
+    spawn([time_path, '-f', '%M', '-o', path] + argv, env)
+    with open(path) as f:
+        return int(f.read().split()[-1])
+
+def parse_importtime(stderr):
+    '''Parse the output of ``-X importtime``.
+
+    :rtype: dict of a module name to its cumulative microseconds
+    '''
+
+    cumulative_map = {}
+    for line in stderr.splitlines():
+        m = importtime_re.match(line)
+        if m:
+            cumulative_map[m.group(3).strip()] = int(m.group(2))
+    return cumulative_map
+
+def write_scripts(dir_path, n_commands):
+    '''Write the scripts of the scenarios into `dir_path`.
+
+    :rtype: dict of a scenario name to its argv
+    '''
+
+    source = '\n'.join(
+        make_source('command_{}'.format(i)) for i in range(n_commands)
+    )
+
+    scenario_argv_map = {'python': [sys.executable, '-c', 'pass']}
+    for name, template in sorted(SCRIPT_TEMPLATES.items()):
+        path = os.path.join(dir_path, '{}.py'.format(name))
+        with open(path, 'w') as f:
+            f.write(template.format(source=source))
+        argv = [sys.executable]
+        if name == 'convert':
+            argv += ['-m', 'clime']
+        scenario_argv_map[name] = argv + [path, 'command_0'] + make_argv(10)
+
+    return scenario_argv_map
+
+def check(results, baseline, threshold):
+    '''Compare the medians of `results` with `baseline`.
+
+    :rtype: list of the regression messages
+    '''
+
+    messages = []
+    for name, result in sorted(results.items()):
+
+        old = baseline.get(name)
+        if old is None:
+            continue
+
+        for key, unit in (('wall', 'ms'), ('maxrss', 'KB')):
+            if result.get(key) is None or old.get(key) is None:
+                # the peak RSS isn't measured without GNU time
+                continue
+            new_median = result[key]['median']
+            old_median = old[key]['median']
+            # a regression must be over the threshold and the noise
+            limit = max(old_median*threshold, old_median+2*old[key]['stdev'])
+            if new_median > limit:
+                scale = 1e3 if key == 'wall' else 1
+                messages.append('{} {}: {:.1f} {} -> {:.1f} {}'.format(
+                    name, key, old_median*scale, unit, new_median*scale, unit
+                ))
+
+    return messages
+
+def main(runs=20, import_runs=5, rss_runs=5, commands=100, scenario=None, output=None, baseline=None, threshold=1.1):
+    '''Benchmark the startup of the processes.
+
+    options:
+        -r=<int>, --runs=<int>           the timed runs of each scenario
+        -i=<int>, --import-runs=<int>    the runs with ``-X importtime``
+        -m=<int>, --rss-runs=<int>       the runs by GNU ``time`` for the peak RSS
+        -c=<int>, --commands=<int>       the commands in the scripts
+        -s=<str>, --scenario=<str>       only run this scenario
+        -o=<str>, --output=<str>         write the results as JSON
+        -b=<str>, --baseline=<str>       check the results against it
+        -t=<float>, --threshold=<float>  the ratio to flag a regression
+    '''
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [ROOT_DIR] + [p for p in [env.get('PYTHONPATH')] if p]
+    )
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    time_path = find_time()
+    if time_path is None:
+        print('GNU time is not found; the peak RSS is not measured')
+
+    dir_path = tempfile.mkdtemp()
+    try:
+
+        scenario_argv_map = write_scripts(dir_path, commands)
+        if scenario:
+            scenario_argv_map = {scenario: scenario_argv_map[scenario]}
+
+        results = {}
+        for name, argv in sorted(scenario_argv_map.items()):
+
+            # warm up the bytecode and the file cache
+            spawn(argv, env)
+
+            walls = []
+            for _ in range(runs):
+                wall, _ = spawn(argv, env)
+                walls.append(wall)
+
+            maxrsses = []
+            if time_path is not None:
+                for _ in range(rss_runs):
+                    maxrsses.append(measure_maxrss(time_path, argv, env, dir_path))
+
+            import_samples = {}
+            for _ in range(import_runs):
+                _, stderr = spawn(argv[:1]+['-X', 'importtime']+argv[1:], env)
+                for module, us in parse_importtime(stderr).items():
+                    import_samples.setdefault(module, []).append(us)
+
+            imports = dict(
+                (module, summarize(samples)['median'])
+                for module, samples in import_samples.items()
+            )
+
+            results[name] = {
+                'wall': summarize(walls),
+                'maxrss': summarize(maxrsses) if maxrsses else None,
+                'imports': imports,
+            }
+
+            print('{:<8} wall {:7.1f} ms (stdev {:.1f})  maxrss {:>7} KB'.format(
+                name,
+                results[name]['wall']['median']*1e3,
+                results[name]['wall']['stdev']*1e3,
+                int(results[name]['maxrss']['median']) if maxrsses else 'n/a'
+            ))
+            top = sorted(
+                ((us, module) for module, us in imports.items() if module.split('.')[0] != 'encodings'),
+                reverse=True
+            )[:5]
+            for us, module in top:
+                print('         import {:<28} {:7.1f} ms'.format(module, us/1e3))
+
+    finally:
+        shutil.rmtree(dir_path)
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                'clime': clime.__version__,
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if baseline:
+        with open(baseline) as f:
+            messages = check(results, json.load(f)['results'], threshold)
+        for message in messages:
+            print('regression:', message)
+        if messages:
+            sys.exit(1)
+
+if __name__ == '__main__':
+    clime.start({'main': main}, default='main', debug=True)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''The benchmark suite of :py:class:`clime.core.Command` and
+:py:class:`clime.core.Program`.
+
+It runs over the synthetic modules of :py:mod:`synthetic` and stores the
+results as JSON, so two commits can be compared::
+
+    $ python benchmarks/suite.py run --output=before.json
+    $ git checkout other-branch
+    $ python benchmarks/suite.py run --output=after.json
+    $ python benchmarks/suite.py compare before.json after.json
+
+The ``make bench`` runs it, too.
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from clime.core import Command, Program, start
+from synthetic import make_function, make_module, make_argv
+
+SIZES = (10, 100, 1000, 10000)
+QUICK_SIZES = (10, 100)
+
+def measure(func, min_time=0.2, repeat=5):
+    '''Time `func` by calling it enough times to take `min_time` seconds.
+
+    :rtype: dict of the best and the median seconds per call
+    '''
+
+    number = 1
+    while True:
+        start_time = time.time()
+        for _ in range(number):
+            func()
+        elapsed = time.time() - start_time
+        if elapsed >= min_time / repeat or number >= 1 << 20:
+            break
+        number *= 2
+
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start_time = time.time()
+        for _ in range(number):
+            func()
+        timings.append((time.time() - start_time) / number)
+
+    timings.sort()
+    return {
+        'best': timings[0],
+        'median': timings[len(timings)//2],
+        'number': number,
+        'repeat': repeat,
+    }
+
+class NullStream(object):
+
+    def write(self, s):
+        pass
+
+    def flush(self):
+        pass
+
+def iter_benchmarks(sizes):
+    '''Yield the pairs of a benchmark name and a function to time.'''
+
+    def init(func):
+        # the spec is shared, so drop it to introspect the function again
+        Command.drop_spec(func)
+        return Command(func)
+
+    for n_doc_lines in (10, 1000):
+        func = make_function(n_args=20, n_doc_lines=n_doc_lines)
+        yield 'command_init[doc={}]'.format(n_doc_lines), lambda func=func: init(func)
+
+    yield 'command_init[shared]', lambda func=func: Command(func)
+
+    func = make_function(n_args=20)
+    cmd = Command(func)
+    for n_items in (10, 10000):
+        argv = make_argv(n_items, n_args=20)
+        yield 'command_parse[argv={}]'.format(len(argv)), lambda argv=argv: cmd.parse(argv)
+
+    def build_usage():
+        cmd.built_usage = None
+        return cmd.build_usage()
+    yield 'command_build_usage', build_usage
+
+    for size in sizes:
+
+        module = make_module(size)
+        yield 'program_init[commands={}]'.format(size), lambda module=module: Program(module)
+
+        def main(module=module, argv=['command_{}'.format(size-1)]+make_argv(10)):
+            Program(module, debug=True).main(list(argv))
+        yield 'program_main[commands={}]'.format(size), main
+
+        # the names share a long head, and the prefix is unique
+        prog = Program(dict(
+            ('tool_{:06d}_run'.format(i), func) for i in range(size)
+        ))
+        prefix = 'tool_{:06d}'.format(size-1)
+        yield 'program_lookup_prefix[commands={}]'.format(size), lambda prog=prog, prefix=prefix: prog.lookup(prefix)
+
+        typo = 'tool_{:06d}_rnu'.format(size-1)
+        yield 'program_suggest[commands={}]'.format(size), lambda prog=prog, typo=typo: prog.suggest(typo)
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BENCH_DIR,
+            stderr=subprocess.STDOUT
+        ).decode('ascii').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(output=None, quick=False, filter=None, min_time=0.2):
+    '''Run the benchmarks and store the results.
+
+    options:
+        -o=<str>, --output=<str>  Write the results as JSON to this path.
+        -q, --quick               Only use the small modules.
+        -f=<str>, --filter=<str>  Only run the benchmarks which contain it.
+        -t=<float>, --min-time=<float>
+                                  The seconds to spend on each repetition.
+    '''
+
+    results = {}
+    stdout = sys.stdout
+    for name, func in iter_benchmarks(QUICK_SIZES if quick else SIZES):
+
+        if filter and filter not in name:
+            continue
+
+        # Program.main prints the return values
+        sys.stdout = NullStream()
+        try:
+            result = measure(func, min_time=min_time)
+        finally:
+            sys.stdout = stdout
+
+        results[name] = result
+        print('{:<36} {:>12.2f} us {:>12.2f} us'.format(
+            name, result['best']*1e6, result['median']*1e6
+        ))
+        sys.stdout.flush()
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump({
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+def compare(before, after, threshold=1.1):
+    '''Compare two results of `run`. It exits with status 1 if a benchmark
+    becomes slower than `threshold` times.
+
+    options:
+        -t=<float>, --threshold=<float>
+    '''
+
+    with open(before) as f:
+        before = json.load(f)
+    with open(after) as f:
+        after = json.load(f)
+
+    print('{:<36} {:>12} {:>12} {:>8}'.format(
+        '', before['revision'] or 'before', after['revision'] or 'after', 'ratio'
+    ))
+
+    regressed = []
+    for name in sorted(after['results']):
+        if name not in before['results']:
+            continue
+        old = before['results'][name]['best']
+        new = after['results'][name]['best']
+        ratio = new / old
+        flag = ''
+        if ratio > threshold:
+            flag = ' slower'
+            regressed.append(name)
+        elif ratio < 1 / threshold:
+            flag = ' faster'
+        print('{:<36} {:>9.2f} us {:>9.2f} us {:>7.2f}x{}'.format(
+            name, old*1e6, new*1e6, ratio, flag
+        ))
+
+    if regressed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    start({'run': run, 'compare': compare}, default='run', debug=True)
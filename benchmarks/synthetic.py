@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It builds synthetic functions, modules and argv for the benchmarks.'''
+
+from __future__ import print_function
+
+import types
+
+FUNC_TEMPLATE = """\
+def {name}(target, {args}*rest):
+    '''{summary}
+
+{body}
+    options:
+{options}
+    '''
+    return target
+"""
+
+def make_source(name, n_args=5, n_doc_lines=10):
+    '''Make the source of a function with `n_args` options and a docstring
+    with `n_doc_lines` lines of prose.
+
+    :rtype: str
+    '''
+
+    args = ''.join('opt{0}={0}, '.format(i) for i in range(n_args))
+    body = '\n'.join(
+        '    Line {} of the long description of {}, which is just prose.'.format(i, name)
+        for i in range(n_doc_lines)
+    )
+    options = '\n'.join(
+        '        -{0}=<int>, --opt{1}=<int>  The option {1}.'.format(chr(ord('a')+i%26), i)
+        if i < 26 else
+        '        --opt{0}=<int>  The option {0}.'.format(i)
+        for i in range(n_args)
+    )
+
+    return FUNC_TEMPLATE.format(
+        name=name,
+        args=args,
+        summary='The command {}.'.format(name),
+        body=body,
+        options=options
+    )
+
+def make_function(n_args=5, n_doc_lines=10, name='command'):
+    '''Make a function by :py:func:`make_source`.'''
+    namespace = {}
+    exec(make_source(name, n_args, n_doc_lines), namespace)
+    return namespace[name]
+
+def make_module(n_commands, n_args=5, n_doc_lines=10, name='synthetic'):
+    '''Make a module with `n_commands` functions named ``command_0``,
+    ``command_1``, and so on.
+
+    :rtype: module
+    '''
+
+    module = types.ModuleType(name)
+    source = '\n'.join(
+        make_source('command_{}'.format(i), n_args, n_doc_lines)
+        for i in range(n_commands)
+    )
+    exec(compile(source, '<{}>'.format(name), 'exec'), module.__dict__)
+    return module
+
+def make_argv(n_items, n_args=5):
+    '''Make argv for a function by :py:func:`make_source`. It sets all the
+    options in the different forms and puts `n_items` arbitrary arguments.
+
+    :rtype: list
+    '''
+
+    argv = []
+    for i in range(n_args):
+        if i < 26 and i % 2:
+            argv.append('-{}{}'.format(chr(ord('a')+i), i))
+        else:
+            argv.append('--opt{}={}'.format(i, i))
+    argv.append('target')
+    argv.extend(str(i) if i % 2 else 'item{}'.format(i) for i in range(n_items))
+    return argv
+
+if __name__ == '__main__':
+    print(make_source('example', n_args=3, n_doc_lines=2))
+    print(make_argv(4, n_args=3))
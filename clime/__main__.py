@@ -2,25 +2,67 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import imp
+from os.path import basename, splitext
 from .core import Program, start
+from .util import load_module
 
-def convert(target, *args, **kargs):
+def load(target):
+    '''Import `target` as a module name or load it from a file path. See
+    :py:func:`clime.util.load_module`.'''
+    return load_module(target)
 
-    module = None
+def convert(target, *args, **kargs):
 
-    try:
-        module = __import__(target)
-    except ImportError:
-        module = imp.load_source('tmp', target)
+    module = load(target)
 
     prog = Program(module)
     prog.main(sys.argv[2:])
 
+def completion(target, shell='bash', name=None):
+    '''Print a static completion script of `target` for shell.
+
+    options:
+        -s <str>, --shell=<str>  bash, zsh or fish
+        -n <str>, --name=<str>   the name of the program in shell
+    '''
+
+    from .completion import build_script
+
+    module = load(target)
+    name = name or splitext(basename(target))[0]
+
+    return build_script(Program(module, name=name), name, shell)
+
+def freeze(target, output=None, check='mtime', default=None):
+    '''Freeze `target` into a module which starts without introspection.
+
+    options:
+        -o <str>, --output=<str>   the path of the frozen module; It is
+                                   <target>_frozen.py by default.
+        -c <str>, --check=<str>    mtime or hash; how to find the source
+                                   is changed
+        -d <str>, --default=<str>  the default command
+    '''
+
+    from .freeze import write_module
+    from .cache import get_source_path
+
+    module = load(target)
+
+    if output is None:
+        source_path = get_source_path(module) or target
+        output = '%s_frozen.py' % splitext(source_path)[0]
+
+    options = {}
+    if default is not None:
+        options['default'] = default
+
+    return write_module(module, output, check, options)
+
 # This function is used by the command script installed in system.
 def run():
     sys.argv[0] = 'clime'
-    start({'convert': convert})
+    start({'convert': convert, 'completion': completion, 'freeze': freeze}, default='convert')
 
 if __name__ == '__main__':
     # ``python -m clime`` will go here.
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It runs the coroutines and the asynchronous generators of commands on an
+event loop. It uses `uvloop` if it is installed.
+
+It requires Python 3.5 or later. The asynchronous generators require Python
+3.6 or later.
+
+.. versionadded:: 0.4
+'''
+
+import asyncio
+
+prefer_uvloop = True
+'''Use `uvloop` if it is installed.'''
+
+def new_event_loop():
+    '''Create a new event loop.'''
+
+    if prefer_uvloop:
+        try:
+            import uvloop
+        except ImportError:
+            pass
+        else:
+            return uvloop.new_event_loop()
+
+    return asyncio.new_event_loop()
+
+def run(coro):
+    '''Run `coro` on a new event loop and return its result.'''
+
+    loop = new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        try:
+            if hasattr(loop, 'shutdown_asyncgens'):
+                loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            loop.close()
+
+async def write_all(writer, agen):
+    '''Write the items of the asynchronous generator `agen` by a
+    :py:class:`~clime.output.Writer`.'''
+
+    try:
+        async for item in agen:
+            writer.write(item)
+    finally:
+        await agen.aclose()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It contains the persistent cache of the command tables and the help texts
+of modules.
+
+The cache of a module is a JSON file in the ``__pycache__`` directory next to
+the source of the module. It is invalidated when the source is changed, or
+when the source of a module which defines the cached functions is changed.
+
+.. versionadded:: 0.4
+'''
+
+import os
+import sys
+
+from . import __version__
+
+def get_source_path(module):
+    '''Get the source path of `module`, or None if it doesn't have one.'''
+
+    path = getattr(module, '__file__', None)
+    if not path:
+        return None
+
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+
+    if not os.path.isfile(path):
+        return None
+
+    return path
+
+def get_cache_path(source_path):
+    '''Get the cache path of `source_path`.'''
+
+    dir_path, file_name = os.path.split(source_path)
+    name = os.path.splitext(file_name)[0]
+    return os.path.join(dir_path, '__pycache__', '%s.clime-%s-py%d%d.json' % (
+        name, __version__, sys.version_info[0], sys.version_info[1]
+    ))
+
+def get_dep_paths(module, funcs):
+    '''Get the source paths of the modules which define `funcs`, except
+    `module` itself.
+
+    :rtype: a sorted list
+    '''
+
+    source_path = get_source_path(module)
+    dep_paths = set()
+    for func in funcs:
+        dep_module = sys.modules.get(getattr(func, '__module__', None) or '')
+        if dep_module is None or dep_module is module:
+            continue
+        dep_path = get_source_path(dep_module)
+        if dep_path is not None and dep_path != source_path:
+            dep_paths.add(dep_path)
+    return sorted(dep_paths)
+
+def get_source_info(source_path):
+    '''Get the mtime, size and hash of `source_path`.'''
+
+    stat = os.stat(source_path)
+    return {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'hash': hash_source(source_path),
+    }
+
+def hash_source(source_path):
+    '''Hash the content of `source_path`.'''
+
+    import hashlib
+    with open(source_path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def check_source(source_path, source_info, check='mtime'):
+    '''Check `source_info` is still fresh.
+
+    :param check: ``'mtime'`` checks the mtime and size of the source; ``'hash'`` checks the content.
+    :type check: str
+    :rtype: bool
+    '''
+
+    if check == 'hash':
+        return source_info.get('hash') == hash_source(source_path)
+
+    stat = os.stat(source_path)
+    return (
+        source_info.get('mtime') == stat.st_mtime and
+        source_info.get('size') == stat.st_size
+    )
+
+def load(module, key, check='mtime'):
+    '''Load the cached data of `module`.
+
+    :param module: a module
+    :param key: a JSON-serializable object; The data is taken only if it is dumped with the same key.
+    :param check: see :py:func:`check_source`
+    :rtype: the data or None
+    '''
+
+    source_path = get_source_path(module)
+    if source_path is None:
+        return None
+
+    import json
+
+    try:
+        with open(get_cache_path(source_path)) as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+    if cache.get('key') != key:
+        return None
+
+    try:
+        if not check_source(source_path, cache.get('source', {}), check):
+            return None
+        for dep_info in cache.get('deps', []):
+            if not check_source(dep_info['path'], dep_info, check):
+                return None
+    except (IOError, OSError, KeyError, TypeError):
+        return None
+
+    return cache.get('data')
+
+def dump(module, key, data, dep_paths=()):
+    '''Dump `data` of `module` into the cache. It fails silently if the cache
+    isn't writable.
+
+    :param module: a module
+    :param key: a JSON-serializable object
+    :param data: a JSON-serializable object
+    :param dep_paths: the other sources which `data` depends on; See :py:func:`get_dep_paths`.
+    :type dep_paths: list
+    :rtype: bool
+    '''
+
+    source_path = get_source_path(module)
+    if source_path is None:
+        return False
+
+    import json
+
+    cache_path = get_cache_path(source_path)
+    tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+
+    try:
+        deps = []
+        for dep_path in dep_paths:
+            dep_info = get_source_info(dep_path)
+            dep_info['path'] = dep_path
+            deps.append(dep_info)
+        cache = {
+            'key': key,
+            'source': get_source_info(source_path),
+            'deps': deps,
+            'data': data,
+        }
+        dir_path = os.path.dirname(cache_path)
+        if not os.path.isdir(dir_path):
+            os.makedirs(dir_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f)
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError, TypeError, ValueError):
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+    return True
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It is the client of :py:mod:`clime.server`.
+
+.. code-block:: bash
+
+    $ python -m clime.client /tmp/prog.sock repeat --times=3 hi
+
+.. versionadded:: 0.4
+'''
+
+import os
+import sys
+import socket
+
+from .server import STATUS, send_request, recv_exactly
+
+def call(path, argv=None):
+    '''Run `argv` by the server at `path` with the stdio of this process.
+
+    :param path: the path of the socket
+    :type path: str
+    :param argv: the arguments; The first one is the program name. By default, it takes ``sys.argv``.
+    :type argv: list
+    :rtype: the exit status
+    '''
+
+    if argv is None:
+        argv = sys.argv
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+        send_request(conn, list(argv), os.getcwd(), dict(os.environ), [0, 1, 2])
+        status, = STATUS.unpack(recv_exactly(conn, STATUS.size))
+    finally:
+        conn.close()
+
+    return status
+
+def main():
+    if len(sys.argv) < 2:
+        sys.stderr.write('usage: python -m clime.client <socket> [<args>...]\n')
+        sys.exit(2)
+    path = sys.argv[1]
+    name = os.path.splitext(os.path.basename(path))[0]
+    sys.exit(call(path, [name]+sys.argv[2:]))
+
+if __name__ == '__main__':
+    main()
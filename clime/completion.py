@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It builds the static shell completion scripts of a
+:py:class:`~clime.core.Program`.
+
+The scripts contain all of the command names and options, so completing a word
+never starts Python or imports the module again. Build them again when the
+commands are changed.
+
+.. versionadded:: 0.4
+'''
+
+import re
+import inspect
+
+SHELLS = ('bash', 'zsh', 'fish')
+
+def quote(s):
+    '''Quote `s` for a shell.'''
+    return "'%s'" % s.replace("'", "'\\''")
+
+def to_identifier(s):
+    '''Convert `s` into a shell function name.'''
+    return re.sub(r'\W', '_', s)
+
+def get_options(cmd):
+    '''Get the options of a :py:class:`~clime.core.Command`.
+
+    :rtype: a list of (option, takes_value)
+    '''
+
+    names = list(cmd.arg_names + cmd.kwonlyarg_names)
+    names.extend(sorted(cmd.alias_arg_map))
+
+    options = []
+    for name in names:
+        arg_name = cmd.dealias(name)
+        takes_value = arg_name not in cmd.bool_arg_set
+        if len(name) > 1:
+            options.append(('--'+name.replace('_', '-'), takes_value))
+        else:
+            options.append(('-'+name, takes_value))
+
+    return options
+
+def get_table(prog):
+    '''Get the command table of a :py:class:`~clime.core.Program`.
+
+    :rtype: a list of (command name, summary, options)
+    '''
+
+    table = []
+    for cmd_name in sorted(prog.command_funcs):
+        cmd = prog.get_command(cmd_name)
+        doc = inspect.getdoc(cmd.func) or ''
+        summary = doc.strip().partition('\n')[0]
+        table.append((cmd_name.replace('_', '-'), summary, get_options(cmd)))
+    return table
+
+def get_default_options(prog):
+    if prog.default is None:
+        return []
+    return get_options(prog.get_command(prog.default))
+
+def build_bash(prog, name):
+    '''Build the completion script for bash.'''
+
+    func_name = '_clime_%s' % to_identifier(name)
+
+    def words(options):
+        return ' '.join(option for option, _ in options)
+
+    default_words = words(get_default_options(prog))
+
+    cases = []
+    for cmd_name, _, options in get_table(prog):
+        cases.append('        %s) words=%s ;;' % (quote(cmd_name), quote(words(options))))
+
+    top_words = ' '.join(cmd_name.replace('_', '-') for cmd_name in sorted(prog.command_funcs))
+    top_words = ' '.join(filter(None, (top_words, default_words, '--help')))
+
+    lines = [
+        '# bash completion for %s; generated by clime' % name,
+        '%s() {' % func_name,
+        '    local cur="${COMP_WORDS[COMP_CWORD]}"',
+        '    local cmd=""',
+        '    local words=""',
+        '    local i',
+        '    for ((i = 1; i < COMP_CWORD; i++)); do',
+        '        case "${COMP_WORDS[i]}" in',
+        '            -*) ;;',
+        '            *) cmd="${COMP_WORDS[i]}"; break ;;',
+        '        esac',
+        '    done',
+        '    case "$cmd" in',
+        '        \'\') words=%s ;;' % quote(top_words),
+    ]
+    lines.extend(cases)
+    lines.extend([
+        '        *) words=%s ;;' % quote(default_words),
+        '    esac',
+        '    COMPREPLY=( $(compgen -W "$words" -- "$cur") )',
+        '}',
+        'complete -o default -F %s %s' % (func_name, quote(name)),
+    ])
+
+    return '\n'.join(lines)
+
+def build_zsh(prog, name):
+    '''Build the completion script for zsh.'''
+
+    func_name = '_clime_%s' % to_identifier(name)
+
+    def words(options):
+        return ' '.join(quote(option) for option, _ in options)
+
+    default_words = words(get_default_options(prog))
+
+    top_words = ' '.join(quote(cmd_name.replace('_', '-')) for cmd_name in sorted(prog.command_funcs))
+    top_words = ' '.join(filter(None, (top_words, default_words, "'--help'")))
+
+    lines = [
+        '#compdef %s' % name,
+        '# zsh completion for %s; generated by clime' % name,
+        '%s() {' % func_name,
+        '    local cmd=""',
+        '    local -a candidates',
+        '    local i',
+        '    for ((i = 2; i < CURRENT; i++)); do',
+        '        case "${words[i]}" in',
+        '            -*) ;;',
+        '            *) cmd="${words[i]}"; break ;;',
+        '        esac',
+        '    done',
+        '    case "$cmd" in',
+        '        \'\') candidates=(%s) ;;' % top_words,
+    ]
+    for cmd_name, _, options in get_table(prog):
+        lines.append('        %s) candidates=(%s) ;;' % (quote(cmd_name), words(options)))
+    lines.extend([
+        '        *) candidates=(%s) ;;' % default_words,
+        '    esac',
+        '    compadd -- "${candidates[@]}"',
+        '    [[ "${words[CURRENT]}" == -* ]] || _files',
+        '}',
+        'compdef %s %s' % (func_name, quote(name)),
+    ])
+
+    return '\n'.join(lines)
+
+def build_fish(prog, name):
+    '''Build the completion script for fish.'''
+
+    def option_args(options):
+        for option, takes_value in options:
+            if option.startswith('--'):
+                arg = '-l %s' % quote(option[2:])
+            else:
+                arg = '-s %s' % quote(option[1:])
+            if takes_value:
+                arg += ' -r'
+            yield arg
+
+    lines = ['# fish completion for %s; generated by clime' % name]
+
+    top = "-n '__fish_use_subcommand'"
+    for cmd_name, summary, _ in get_table(prog):
+        line = 'complete -c %s %s -f -a %s' % (quote(name), top, quote(cmd_name))
+        if summary:
+            line += ' -d %s' % quote(summary)
+        lines.append(line)
+    for arg in option_args(get_default_options(prog)):
+        lines.append('complete -c %s %s %s' % (quote(name), top, arg))
+
+    for cmd_name, _, options in get_table(prog):
+        cond = '-n %s' % quote('__fish_seen_subcommand_from %s' % cmd_name)
+        for arg in option_args(options):
+            lines.append('complete -c %s %s %s' % (quote(name), cond, arg))
+
+    return '\n'.join(lines)
+
+def build_script(prog, name, shell='bash'):
+    '''Build the completion script of `prog` for `shell`.
+
+    :param prog: a program
+    :type prog: :py:class:`~clime.core.Program`
+    :param name: the name of the program in shell
+    :type name: str
+    :param shell: ``bash``, ``zsh`` or ``fish``
+    :type shell: str
+    :rtype: str
+    '''
+
+    builders = {'bash': build_bash, 'zsh': build_zsh, 'fish': build_fish}
+
+    if shell not in builders:
+        raise ValueError('unsupported shell: %r (choose from %s)' % (shell, ', '.join(SHELLS)))
+
+    return builders[shell](prog, name)
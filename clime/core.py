@@ -3,20 +3,105 @@
 
 from __future__ import print_function
 
-__all__ = ['start', 'customize', 'CMD_SUFFIX', 'Program', 'Command']
+__all__ = ['start', 'customize', 'CMD_SUFFIX', 'Program', 'Command', 'CommandSpec', 'ParseError']
 
+import os
 import sys
-import inspect
-import re
 from os.path import basename
-from collections import defaultdict
-from .util import json, autotype, getargspec
+from .util import json, open_file, map_bytes, autotype, autotype_all, getargspec, getkwonlyargs, iscoroutine, ArrayCaster
+from .util import LazyRegex, FunctionType, MethodType, BuiltinFunctionType, ModuleType, intern, PrefixIndex, NgramIndex
 
 Empty = type('Empty', (object, ), {
     '__nonzero__': lambda self: False,
     '__repr__'   : lambda self: 'Empty',
 })()
 
+class ParseError(ValueError):
+    '''It is raised if the raw arguments can't be parsed, such as an ambiguous
+    prefix of a command name or an option.
+
+    :param msg: the message
+    :type msg: str
+    :param candidates: the names which the user may mean
+    :type candidates: list
+
+    .. versionadded:: 0.4
+    '''
+
+    def __init__(self, msg, candidates=()):
+        ValueError.__init__(self, msg)
+        self.candidates = list(candidates)
+
+def format_candidates(candidates, limit=10):
+    '''Format the candidates of a :py:class:`ParseError` for a message.
+
+    .. versionadded:: 0.4
+    '''
+
+    shown = ', '.join(candidates[:limit])
+    if len(candidates) > limit:
+        shown += ', ...'
+    return shown
+
+def did_you_mean(msg, candidates):
+    '''Make a :py:class:`ParseError` of an unknown name with the suggested
+    `candidates`.
+
+    .. versionadded:: 0.4
+    '''
+
+    if candidates:
+        msg = '%s; did you mean: %s?' % (msg, format_candidates(candidates))
+    return ParseError(msg, candidates)
+
+class CommandSpec(object):
+    '''The introspected information and the parse plan of a function, which
+    are built by :py:class:`Command`.
+
+    A spec is shared by the commands of the same function, even in the
+    different programs, so a function is introspected once, and a command
+    only keeps its own name and options. The attributes of a spec are also
+    the attributes of its commands, such as :py:attr:`Command.arg_names`.
+
+    .. versionadded:: 0.4
+    '''
+
+    __slots__ = (
+        'arg_names', 'vararg_name', 'keyarg_name', 'kwonlyarg_names', 'arg_defaults',
+        'no_defult_args_len', 'arg_default_map',
+        'arg_meta_map', 'alias_arg_map', 'option_arg_map', 'caster_map',
+        'karg_caster', 'parg_casters', 'vararg_caster', 'bool_arg_set',
+        'counter_arg_set', 'isbuiltin', 'built_usage', 'option_index',
+        'option_ngrams',
+    )
+
+    @property
+    def arg_name_set(self):
+        # it is only used to introspect, so it isn't kept
+        return frozenset(self.arg_names + self.kwonlyarg_names)
+
+    def copy(self):
+        '''Copy this spec. The metas and the aliases are copied, too, so they
+        can be changed without the other commands.
+
+        :rtype: :py:class:`CommandSpec`
+        '''
+
+        spec = CommandSpec()
+        for name in self.__slots__:
+            setattr(spec, name, getattr(self, name))
+        spec.arg_meta_map = dict(self.arg_meta_map)
+        spec.alias_arg_map = dict(self.alias_arg_map)
+        return spec
+
+spec_map = {}
+'''It maps a pair of a command class and whether the function is a bound
+method to a `weakref.WeakKeyDictionary`, which maps a function to its shared
+:py:class:`CommandSpec`.
+
+.. versionadded:: 0.4
+'''
+
 class Command(object):
     '''Make a Python function or a built-in function accepts arguments from
     command line.
@@ -25,6 +110,23 @@ class Command(object):
     :type func: Python function or built-in function
     :param name: the name of this command
     :type name: str
+    :param meta: the information dumped by :py:meth:`Command.dump_meta`; If it is given, the function is not introspected.
+    :type meta: dict
+    :param stream_varargs: Pass the arbitrary arguments as a lazy iterator. See :py:meth:`Command.iter_varargs`.
+    :type stream_varargs: bool
+    :param response_files: Expand the raw arguments ``@path`` to the arguments in the files. See :py:mod:`clime.response`.
+    :type response_files: bool
+
+    The introspected information is kept in :py:attr:`Command.spec`, a
+    :py:class:`CommandSpec` shared by the commands of the same function, so a
+    command costs only a little memory. Its `tracer` is the
+    :py:class:`~clime.tracing.Tracer` of the phases, or None.
+
+    .. versionadded:: 0.4
+        Added `meta`, `stream_varargs` and `response_files`.
+
+    .. versionchanged:: 0.4
+        It has `__slots__`, and the introspected information is shared.
 
     .. versionchanged:: 0.1.5
         It is rewritten again. The API is same as the previous version, but some
@@ -35,14 +137,19 @@ class Command(object):
         It is almost rewritten.
     '''
 
-    arg_desc_re = re.compile(r'^\s*-')
+    __slots__ = ('name', 'func', 'stream_varargs', 'response_files', 'tracer', 'spec')
+
+    arg_desc_re = LazyRegex(r'^\s*-')
     '''It is used to filter argument descriptions in a docstring.
 
     The regex is ``r'^\s*-'`` by default. It means any line starts with a hyphen
     (-), and whitespace characters before this hyphen are ignored.
+
+    .. versionchanged:: 0.4
+        It is compiled at the first use. See :py:class:`~clime.util.LazyRegex`.
     '''
 
-    arg_re = re.compile(r'-(?P<long>-)?(?P<key>(?(long)[^ =,]+|.))[ =]?(?P<meta>[^ ,]+)?')
+    arg_re = LazyRegex(r'-(?P<long>-)?(?P<key>(?(long)[^ =,]+|.))[ =]?(?P<meta>[^ ,]+)?')
     '''After it gets descriptions by :py:attr:`Command.arg_desc_re` from a
     docstring, it extracts an argument name (or alias) and a metavar from each
     description by this regex.
@@ -56,6 +163,9 @@ class Command(object):
     - ``-k meta``
     - ``-k=meta``
     - ``-kmeta``
+
+    .. versionchanged:: 0.4
+        It is compiled at the first use.
     '''
 
     arg_type_map = {
@@ -64,6 +174,8 @@ class Command(object):
         's': str, 'str': str, 'string': str,
         'f': float, 'float': float,
         'json': json,
+        'file': open_file,
+        'bytes': map_bytes,
         None: autotype
     }
     '''A metavar implies a type.
@@ -73,43 +185,124 @@ class Command(object):
     The ``f`` and ``float`` mean a `float`.
 
     It also supports to use ``json``. It converts a json from user to a Python
-    type.
+    type. A ``@path`` reads the json from a file instead of argv.
+
+    The ``file`` means a file opened for reading bytes, and the ``bytes`` means
+    `bytes`; a ``@path`` of them is memory-mapped. See
+    :py:func:`~clime.util.open_file` and :py:func:`~clime.util.map_bytes`.
 
     If you don't set a metavar, it will try to guess a correct type.
 
+    An array metavar, such as ``int[]``, ``float64[]`` or ``f32...``, casts
+    comma-separated values into a compact array by
+    :py:class:`~clime.util.ArrayCaster`. If it is the metavar of the arbitrary
+    arguments, all of them are cast in one step and passed as one array, so the
+    function gets ``args == (array, )``.
+
     The metavars here are normalized. Metavars from docstrings will be
     normalized, too. For example, ``JSON`` and ``<json>`` are equal to ``json``.
     '''
 
-    def __init__(self, func, name=None):
+    def __init__(self, func, name=None, meta=None, stream_varargs=False, response_files=False):
 
         self.name = name
         self.func = func
+        self.stream_varargs = stream_varargs
+        self.response_files = response_files
+        self.tracer = None
+
+        specs, key = self._get_specs(func)
+        try:
+            spec = specs.get(key)
+        except TypeError:
+            # it can't be weakly referenced, such as a built-in function
+            specs = spec = None
+        if spec is not None:
+            self.spec = spec
+            return
+
+        self.spec = CommandSpec()
+
+        if meta is not None:
+            self.load_meta(meta)
+        else:
+            self._introspect(func)
+
+        if specs is not None:
+            specs[key] = self.spec
+
+    @classmethod
+    def _get_specs(cls, func):
+
+        # the bound methods of a function share a spec
+        is_method = isinstance(func, MethodType)
+        if is_method:
+            func = func.__func__
+
+        specs = spec_map.get((cls, is_method))
+        if specs is None:
+            import weakref
+            specs = spec_map.setdefault((cls, is_method), weakref.WeakKeyDictionary())
+
+        return specs, func
+
+    @classmethod
+    def drop_spec(cls, func):
+        '''Drop the shared :py:class:`CommandSpec` of `func`, so the next
+        command of it introspects it again. Call it if the function or its
+        docstring is changed.
+
+        :param func: a function
+        :type func: Python function or built-in function
+
+        .. versionadded:: 0.4
+        '''
+
+        specs, key = cls._get_specs(func)
+        try:
+            specs.pop(key, None)
+        except TypeError:
+            pass
+
+    def _introspect(self, func):
+
+        spec = self.spec
 
         arg_names, vararg_name, keyarg_name, arg_defaults = getargspec(func)
 
-        # copy the argument spec info to instance
-        self.arg_names = arg_names
-        self.vararg_name = vararg_name
-        self.keyarg_name = keyarg_name
-        self.arg_defaults = arg_defaults or tuple()
+        # copy the argument spec info to the spec
+        spec.arg_names = tuple(arg_names)
+        spec.vararg_name = vararg_name
+        spec.keyarg_name = keyarg_name
+        spec.kwonlyarg_names = tuple(getkwonlyargs(func))
+        spec.arg_defaults = tuple(arg_defaults or ())
 
-        # additional information
-        self.no_defult_args_len = len(self.arg_names) - len(self.arg_defaults)
-        self.arg_name_set = set(arg_names)
-        self.arg_default_map = dict(zip(
-            *map(reversed, (self.arg_names, self.arg_defaults))
-        ))
+        self._complete_argspec()
 
         # try to find metas and aliases out
 
-        self.arg_meta_map = {}
-        self.alias_arg_map = {}
+        spec.arg_meta_map = {}
+        spec.alias_arg_map = {}
+
+        # a command without arguments has nothing to find in its docstring
+        if arg_names or vararg_name or keyarg_name or spec.kwonlyarg_names:
+            self._parse_doc(func)
 
-        doc = inspect.getdoc(func)
-        if not doc: return
+        self.compile()
 
-        for line in doc.splitlines():
+    def _parse_doc(self, func):
+
+        spec = self.spec
+        name_set = spec.arg_name_set
+
+        doc = func.__doc__
+        if doc is None and isinstance(func, MethodType):
+            # it may inherit the docstring from its base class
+            import inspect
+            doc = inspect.getdoc(func)
+
+        # expand tabs as `inspect.getdoc` does; the indents don't matter here
+        for line in (doc or '').expandtabs().splitlines():
 
             if not self.arg_desc_re.match(line): continue
 
@@ -118,17 +311,197 @@ class Command(object):
             aliases_set = set()
             for m in self.arg_re.finditer(arg_part):
                 key, meta = m.group('key', 'meta')
-                key = key.replace('-', '_')
-                self.arg_meta_map[key] = meta
+                # the names and metas repeat in the commands
+                key = intern(key.replace('-', '_'))
+                if meta is not None:
+                    meta = intern(meta)
+                spec.arg_meta_map[key] = meta
                 aliases_set.add(key)
 
-            arg_name_set = self.arg_name_set & aliases_set
+            arg_name_set = aliases_set & name_set
             if not arg_name_set: continue
 
             aliases_set -= arg_name_set
             arg_name = arg_name_set.pop()
             for alias in aliases_set:
-                self.alias_arg_map[alias] = arg_name
+                spec.alias_arg_map[alias] = arg_name
+
+    def _complete_argspec(self):
+        # additional information
+        spec = self.spec
+        spec.no_defult_args_len = len(spec.arg_names) - len(spec.arg_defaults)
+        spec.arg_default_map = dict(zip(
+            *map(reversed, (spec.arg_names, spec.arg_defaults))
+        ))
+        # the keyword-only arguments are options
+        spec.arg_default_map.update(getattr(self.func, '__kwdefaults__', None) or {})
+
+    def dump_meta(self):
+        '''Dump the introspected information of this command into a
+        JSON-serializable `dict`.
+
+        The default values are not included. They are taken from the function
+        again when the information is loaded.
+
+        :rtype: dict
+
+        .. versionadded:: 0.4
+        '''
+
+        spec = self.spec
+        return {
+            'arg_names': list(spec.arg_names),
+            'vararg_name': spec.vararg_name,
+            'keyarg_name': spec.keyarg_name,
+            'kwonlyarg_names': list(spec.kwonlyarg_names),
+            'arg_defaults_len': len(spec.arg_defaults),
+            'arg_meta_map': spec.arg_meta_map,
+            'alias_arg_map': spec.alias_arg_map,
+            'usage': self.build_usage(without_name=True),
+        }
+
+    def load_meta(self, meta):
+        '''Load the information dumped by :py:meth:`Command.dump_meta`
+        instead of introspecting the function.
+
+        If the arguments of a Python function don't match the information,
+        the function is changed after it is dumped, so it is introspected
+        instead.
+
+        :param meta: the dumped information
+        :type meta: dict
+
+        .. versionadded:: 0.4
+        '''
+
+        spec = self.spec
+        func = self.func
+
+        if isinstance(func, (FunctionType, MethodType)):
+            arg_names, vararg_name, keyarg_name, arg_defaults = getargspec(func)
+            if (
+                list(arg_names) != list(meta['arg_names']) or
+                vararg_name != meta['vararg_name'] or
+                keyarg_name != meta['keyarg_name'] or
+                len(arg_defaults or ()) != meta['arg_defaults_len'] or
+                getkwonlyargs(func) != list(meta.get('kwonlyarg_names', ()))
+            ):
+                self._introspect(func)
+                return
+
+        spec.arg_names = tuple(intern(str(name)) for name in meta['arg_names'])
+        spec.vararg_name = meta['vararg_name']
+        spec.keyarg_name = meta['keyarg_name']
+        spec.kwonlyarg_names = tuple(
+            intern(str(name)) for name in meta.get('kwonlyarg_names', ())
+        )
+
+        arg_defaults_len = meta['arg_defaults_len']
+        arg_defaults = getattr(func, '__defaults__', None) or tuple()
+        if len(arg_defaults) != arg_defaults_len:
+            # a built-in function doesn't tell us its defaults
+            arg_defaults = (None, ) * arg_defaults_len
+        spec.arg_defaults = tuple(arg_defaults)
+
+        self._complete_argspec()
+
+        spec.arg_meta_map = dict(meta['arg_meta_map'])
+        spec.alias_arg_map = dict(meta['alias_arg_map'])
+
+        self.compile()
+        spec.built_usage = meta.get('usage')
+
+    def compile(self):
+        '''Compile the parse plan of this command.
+
+        It is called at the end of the construction. The plan includes an
+        option dispatch table, the casters of arguments and the classification
+        of boolean and counter options, so :py:meth:`Command.parse` doesn't
+        need to resolve them again on every call.
+
+        Call it again if you change :py:attr:`Command.arg_meta_map` or
+        :py:attr:`Command.alias_arg_map` after the construction. They are in
+        the shared :py:attr:`Command.spec`, so the changes apply to all the
+        commands of the function. To change one command only, copy its spec
+        first: ::
+
+            cmd.spec = cmd.spec.copy()
+
+        .. versionadded:: 0.4
+        '''
+
+        spec = self.spec
+
+        # the option dispatch table: option key -> argument name
+        spec.option_arg_map = dict(
+            (name, name) for name in spec.arg_names + spec.kwonlyarg_names
+        )
+        spec.option_arg_map.update(spec.alias_arg_map)
+
+        # the casters of arguments
+        spec.caster_map = dict(
+            (key, self.build_caster(meta))
+            for key, meta in spec.arg_meta_map.items()
+        )
+        default_caster = self.arg_type_map[None]
+        if spec.keyarg_name:
+            spec.karg_caster = spec.caster_map.get(spec.keyarg_name, default_caster)
+        else:
+            spec.karg_caster = default_caster
+        spec.parg_casters = tuple(
+            spec.caster_map.get(name, default_caster)
+            for name in spec.arg_names[:spec.no_defult_args_len]
+        )
+        if spec.vararg_name:
+            spec.vararg_caster = spec.caster_map.get(spec.vararg_name, default_caster)
+        else:
+            spec.vararg_caster = None
+
+        # the boolean options switch; the int options count
+        spec.bool_arg_set = frozenset(
+            name for name, default in spec.arg_default_map.items()
+            if isinstance(default, bool)
+        )
+        spec.counter_arg_set = frozenset(
+            name for name, default in spec.arg_default_map.items()
+            if isinstance(default, int) and name not in spec.bool_arg_set
+        )
+
+        spec.isbuiltin = isinstance(self.func, BuiltinFunctionType)
+
+        # the usage is built again when it is required
+        spec.built_usage = None
+
+        # the indexes of the long options are built when they are required
+        spec.option_index = None
+        spec.option_ngrams = None
+
+    def build_caster(self, meta):
+        '''Build a caster from a metavar by :py:attr:`Command.arg_type_map`.
+
+        :param meta: a metavar; None means no metavar
+        :type meta: str
+        :rtype: callable
+
+        .. versionadded:: 0.4
+        '''
+
+        if meta is not None:
+            meta = meta.strip('<>').lower()
+
+        try:
+            return self.arg_type_map[meta]
+        except KeyError:
+            pass
+
+        array_caster = ArrayCaster.from_meta(meta)
+        if array_caster is not None:
+            return array_caster
+
+        # an unknown metavar only fails when it is really used
+        def caster(val):
+            return self.arg_type_map[meta](val)
+        return caster
 
     def dealias(self, alias):
         '''It maps `alias` to an argument name. If this `alias` maps noting, it
@@ -140,6 +513,71 @@ class Command(object):
         '''
         return self.alias_arg_map.get(alias, alias)
 
+    def complete_option(self, key):
+        '''Complete a long option `key` which is a unique prefix of an option,
+        such as ``ver`` of ``verbose``.
+
+        The options are indexed by :py:class:`~clime.util.PrefixIndex` at
+        the first time. If the function takes arbitrary keyword arguments,
+        `key` isn't completed, since it may be a new keyword.
+
+        :param key: a long option without ``--``, and ``-`` replaced by ``_``
+        :type key: str
+        :rtype: str; the argument name, or `key` itself if nothing is found
+        :raises ParseError: if `key` is an ambiguous prefix
+
+        .. versionadded:: 0.4
+        '''
+
+        spec = self.spec
+        if spec.keyarg_name or not key:
+            return key
+
+        index = spec.option_index
+        if index is None:
+            index = spec.option_index = PrefixIndex(
+                name for name in spec.option_arg_map if len(name) > 1
+            )
+
+        options = index.find(key)
+        arg_names = set(spec.option_arg_map[option] for option in options)
+        if len(arg_names) == 1:
+            return arg_names.pop()
+        if arg_names:
+            candidates = ['--'+option.replace('_', '-') for option in options]
+            raise ParseError("ambiguous option --%s: %s" % (
+                key.replace('_', '-'), format_candidates(candidates)
+            ), candidates)
+
+        return key
+
+    def suggest_options(self, key, limit=3):
+        '''Suggest the long options similar to an unknown option `key`.
+
+        The options are indexed by :py:class:`~clime.util.NgramIndex` at the
+        first time, so it doesn't compare `key` with all of them.
+
+        :param key: a long option without ``--``, and ``-`` replaced by ``_``
+        :type key: str
+        :param limit: suggest at most `limit` options
+        :type limit: int
+        :rtype: list of options, such as ``--verbose``
+
+        .. versionadded:: 0.4
+        '''
+
+        spec = self.spec
+        index = spec.option_ngrams
+        if index is None:
+            index = spec.option_ngrams = NgramIndex(
+                name for name in spec.option_arg_map if len(name) > 1
+            )
+
+        return [
+            '--'+name.replace('_', '-')
+            for _, name in index.find(key)[:limit]
+        ]
+
     def cast(self, arg_name, val):
         '''Cast `val` by `arg_name`.
 
@@ -149,19 +587,24 @@ class Command(object):
         :type val: any
         :rtype: any
         '''
-        meta = self.arg_meta_map.get(arg_name)
-        if meta is not None:
-            meta = meta.strip('<>').lower()
-        type = self.arg_type_map[meta]
-        return type(val)
+        caster = self.caster_map.get(arg_name, self.arg_type_map[None])
+        return caster(val)
 
     def parse(self, raw_args=None):
         """Parse the raw arguments.
 
         :param raw_args: raw arguments
-        :type raw_args: a list or a str
+        :type raw_args: a list, an iterable or a str
         :rtype: double-tuple: (pargs, kargs)
 
+        .. versionchanged:: 0.4
+            The raw arguments are consumed one by one, so they can be a lazy
+            iterable. If the command is built with `response_files`, a raw
+            argument ``@path`` is expanded to the arguments in the file. See
+            :py:mod:`clime.response`.
+            A long option can be a unique prefix, such as ``--ver`` of
+            ``--verbose``. See :py:meth:`Command.complete_option`.
+
         .. versionadded:: 0.1.5
 
         Here are examples:
@@ -248,32 +691,57 @@ class Command(object):
         elif isinstance(raw_args, str):
             raw_args = raw_args.split()
 
+        if self.response_files:
+            from .response import expand
+            raw_args = expand(raw_args)
+
+        spec = self.spec
+        option_arg_map = spec.option_arg_map
+        bool_arg_set = spec.bool_arg_set
+
+        # an unknown option fails before the casting and the function; the
+        # functions which take arbitrary keyword arguments accept it
+        strict = not (spec.keyarg_name or spec.isbuiltin)
+
         # collect arguments from the raw arguments
 
         pargs = []
-        kargs = defaultdict(list)
+        kargs = {}
 
-        # consume raw_args
-        while raw_args:
+        # consume raw_args in one pass; it may be a lazy iterator
+        raw_args = iter(raw_args)
+        next_raw_arg = next(raw_args, None)
+        while next_raw_arg is not None:
+
+            raw_arg = next_raw_arg
+            next_raw_arg = next(raw_args, None)
 
             # try to find `arg_name` and `val`
             arg_name = None
             val = Empty
 
             # '-a...', '--arg...', but no '-'
-            if raw_args[0].startswith('-') and len(raw_args[0]) >= 2:
+            if raw_arg.startswith('-') and len(raw_arg) >= 2:
 
                 # partition by eq sign
                 # -m=hello
                 # --message=hello -> val='hello'
                 # --message=      -> val=''
                 # --bool          -> val=Empty
-                before_eq_str, eq_str, val = raw_args.pop(0).partition('=')
+                before_eq_str, eq_str, val = raw_arg.partition('=')
                 if not eq_str:
                     val = Empty
 
                 if before_eq_str.startswith('--'):
-                    arg_name = self.dealias(before_eq_str[2:].replace('-', '_'))
+                    key = before_eq_str[2:].replace('-', '_')
+                    arg_name = option_arg_map.get(key)
+                    if arg_name is None:
+                        arg_name = self.complete_option(key)
+                        if strict and key and arg_name not in option_arg_map:
+                            raise did_you_mean(
+                                'unknown option --%s' % key.replace('_', '-'),
+                                self.suggest_options(key)
+                            )
                 else:
 
                     # if it starts with only '-', it may be various
@@ -283,17 +751,19 @@ class Command(object):
                     # '-nnnmhello' -> sep=5 (the char 'h')
                     sep = 1
                     for c in before_eq_str[1:]:
-                        if c in self.arg_name_set or c in self.alias_arg_map:
+                        if c in option_arg_map:
                             sep += 1
                         else:
                             break
 
+                    if strict and sep == 1 and len(before_eq_str) > 1:
+                        raise ParseError('unknown option %s' % before_eq_str[:2])
+
                     # handle the bool option sequence
                     # '-nnn'       -> 'nn'
                     # '-nnnmhello' -> 'nnn'
                     for c in before_eq_str[1:sep-1]:
-                        arg_name = self.dealias(c)
-                        kargs[arg_name].append(Empty)
+                        kargs.setdefault(option_arg_map[c], []).append(Empty)
 
                     # handle the last option
                     # '-nnn'       -> 'n' (the 3rd n)
@@ -312,28 +782,31 @@ class Command(object):
                     # didn't get val
                     val is Empty and
                     # this arg_name need a explicit val
-                    not isinstance(self.arg_default_map.get(arg_name), bool) and
+                    arg_name not in bool_arg_set and
                     # we have thing to take
-                    raw_args and not raw_args[0].startswith('-')
+                    next_raw_arg is not None and not next_raw_arg.startswith('-')
                 ):
-                    val = raw_args.pop(0)
+                    val = next_raw_arg
+                    next_raw_arg = next(raw_args, None)
             else:
-                val = raw_args.pop(0)
+                val = raw_arg
 
             if arg_name:
-                kargs[arg_name].append(val)
+                kargs.setdefault(arg_name, []).append(val)
             else:
                 pargs.append(val)
 
+        tracer = self.tracer
+        if tracer is not None:
+            cast_start = tracer.timer()
+
         # compact the collected kargs
-        kargs = dict(kargs)
         for arg_name, collected_vals in kargs.items():
-            default = self.arg_default_map.get(arg_name)
-            if isinstance(default, bool):
+            if arg_name in bool_arg_set:
                 # switch the boolean value if default is a bool
-                kargs[arg_name] = not default
+                kargs[arg_name] = not spec.arg_default_map[arg_name]
             elif all(val is Empty for val in collected_vals):
-                if isinstance(default, int):
+                if arg_name in spec.counter_arg_set:
                     kargs[arg_name] = len(collected_vals)
                 else:
                     kargs[arg_name] = None
@@ -341,31 +814,99 @@ class Command(object):
                 # take the last value
                 val = next(val for val in reversed(collected_vals) if val is not Empty)
                 # cast this key arg
-                if not self.keyarg_name or arg_name in self.arg_meta_map:
-                    kargs[arg_name] = self.cast(arg_name, val)
-                else:
-                    kargs[arg_name] = self.cast(self.keyarg_name, val)
+                caster = spec.caster_map.get(arg_name) or spec.karg_caster
+                kargs[arg_name] = caster(val)
 
         # add the defaults to kargs
-        for arg_name, default in self.arg_default_map.items():
+        for arg_name, default in spec.arg_default_map.items():
             if arg_name not in kargs:
                 kargs[arg_name] = default
 
         # keyword-first resolving
-        isbuiltin = inspect.isbuiltin(self.func)
-        for pos, name in enumerate(self.arg_names):
-            if name in kargs and (pos < len(pargs) or isbuiltin):
+        for pos, name in enumerate(spec.arg_names):
+            if name in kargs and (pos < len(pargs) or spec.isbuiltin):
                 pargs.insert(pos, kargs.pop(name))
 
         # cast the pos args
-        for i, parg in enumerate(pargs):
-            if i < self.no_defult_args_len:
-                pargs[i] = self.cast(self.arg_names[i], parg)
-            elif self.vararg_name:
-                pargs[i] = self.cast(self.vararg_name, parg)
+        for i, caster in enumerate(spec.parg_casters[:len(pargs)]):
+            pargs[i] = caster(pargs[i])
+
+        if spec.vararg_caster:
+
+            caster = spec.vararg_caster
+            args_len = len(spec.arg_names)
+
+            # the varargs may be passed as one object, even if it is empty; the
+            # arguments before them are passed positionally then
+            bulk = self.stream_varargs or isinstance(caster, ArrayCaster)
+            bulk = bulk and all(
+                name in kargs for name in spec.arg_names[len(pargs):]
+            )
+
+            start = spec.no_defult_args_len
+            end = min(args_len, len(pargs)) if bulk else len(pargs)
+            if caster is autotype:
+                pargs[start:end] = autotype_all(pargs[start:end])
+            else:
+                pargs[start:end] = [caster(parg) for parg in pargs[start:end]]
+
+            if bulk:
+                vals = pargs[args_len:]
+                del pargs[args_len:]
+                pargs.extend([kargs.pop(name) for name in spec.arg_names[len(pargs):]])
+                if self.stream_varargs:
+                    pargs.append(self.iter_varargs(vals))
+                else:
+                    pargs.append(caster.cast_all(vals))
+
+        if tracer is not None:
+            tracer.emit('cast', cast_start, command=self.name)
 
         return (pargs, kargs)
 
+    def iter_varargs(self, vals):
+        """Iterate the arbitrary arguments `vals` lazily, and cast them on
+        demand.
+
+        :param vals: the raw arbitrary arguments
+        :type vals: list
+        :rtype: iterator
+
+        .. versionadded:: 0.4
+
+        If the command is built with `stream_varargs`, the arbitrary arguments
+        are passed as one iterator returned by this method, so the function
+        gets ``args == (iterator, )``. A ``-`` or ``@-`` in the arbitrary
+        arguments reads the lines from `stdin`, and an ``@path`` reads the
+        lines from the file, so a huge input is processed in constant memory.
+
+        >>> def total(*numbers):
+        ...     '''
+        ...     --numbers <int>
+        ...     '''
+        ...     numbers, = numbers
+        ...     return sum(numbers)
+        ...
+        >>> Command(total, stream_varargs=True).execute('1 2 3')
+        6
+        """
+
+        caster = self.vararg_caster
+
+        for val in vals:
+
+            if val in ('-', '@-'):
+                for line in sys.stdin:
+                    yield caster(line.rstrip('\r\n'))
+
+            elif isinstance(val, str) and val.startswith('@'):
+                with open(val[1:]) as f:
+                    for line in f:
+                        yield caster(line.rstrip('\r\n'))
+
+            else:
+                yield caster(val)
+
     scan = parse
     '''
     .. deprecated:: 0.1.5
@@ -378,10 +919,33 @@ class Command(object):
         :param raw_args: raw arguments
         :type raw_args: a list or a str
         :rtype: any
+
+        .. versionchanged:: 0.4
+            If the function returns a coroutine, such as an ``async def``
+            function, it runs the coroutine on an event loop and returns the
+            result. See :py:mod:`clime.aio`.
         '''
 
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.timer()
+
         pargs, kargs = self.parse(raw_args)
-        return self.func(*pargs, **kargs)
+
+        if tracer is not None:
+            tracer.emit('parse', start, command=self.name)
+            start = tracer.timer()
+
+        return_val = self.func(*pargs, **kargs)
+
+        if iscoroutine(return_val):
+            from .aio import run
+            return_val = run(return_val)
+
+        if tracer is not None:
+            tracer.emit('execute', start, command=self.name)
+
+        return return_val
 
     def build_usage(self, without_name=False):
         '''Build the usage of this command.
@@ -389,57 +953,76 @@ class Command(object):
         :param without_name: Make it return an usage without the function name.
         :type without_name: bool
         :rtype: str
+
+        .. versionchanged:: 0.4
+            The usage is built only once and kept in the instance.
         '''
 
+        if self.built_usage is None:
+            self.built_usage = self._build_usage()
+
+        if without_name:
+            return '%s' % self.built_usage
+        else:
+            return '%s %s' % ((self.name or self.func.__name__).replace('_', '-'), self.built_usage)
+
+    def _build_usage(self):
+
+        spec = self.spec
+
         # build reverse alias map
         alias_arg_rmap = {}
-        for alias, arg_name in self.alias_arg_map.items():
+        for alias, arg_name in spec.alias_arg_map.items():
             aliases = alias_arg_rmap.setdefault(arg_name, [])
             aliases.append(alias)
 
         usage = []
 
-        # build the arguments which have default value
-        if self.arg_defaults:
-            for arg_name in self.arg_names[-len(self.arg_defaults):]:
-
-                pieces = []
-                for name in alias_arg_rmap.get(arg_name, [])+[arg_name]:
-
-                    is_long_opt = len(name) > 1
-                    pieces.append('%s%s' % ('-' * (1+is_long_opt), name.replace('_', '-')))
-
-                    meta = self.arg_meta_map.get(name)
-                    if meta is None:
-                        # autometa
-                        default = self.arg_default_map[self.dealias(name)]
-                        if isinstance(default, bool):
-                            continue
-                        elif default is None:
-                            meta = '<value>'
-                        else:
-                            meta = '{!r}'.format(default)
-
-                    if is_long_opt:
-                        pieces[-1] += '='+meta
+        # build the arguments which have default value, and the keyword-only
+        # arguments
+        option_names = spec.kwonlyarg_names
+        if spec.arg_defaults:
+            option_names = spec.arg_names[-len(spec.arg_defaults):] + option_names
+        for arg_name in option_names:
+
+            pieces = []
+            for name in alias_arg_rmap.get(arg_name, [])+[arg_name]:
+
+                is_long_opt = len(name) > 1
+                pieces.append('%s%s' % ('-' * (1+is_long_opt), name.replace('_', '-')))
+
+                meta = spec.arg_meta_map.get(name)
+                if meta is None:
+                    # autometa
+                    default = spec.arg_default_map.get(self.dealias(name))
+                    if isinstance(default, bool):
+                        continue
+                    elif default is None:
+                        meta = '<value>'
                     else:
-                        pieces[-1] += ' '+meta
+                        meta = '{!r}'.format(default)
+
+                if is_long_opt:
+                    pieces[-1] += '='+meta
+                else:
+                    pieces[-1] += ' '+meta
 
+            if arg_name in spec.arg_default_map:
                 usage.append('[%s]' % ' | '.join(pieces))
+            else:
+                # a keyword-only argument without default value
+                usage.append('(%s)' % ' | '.join(pieces) if len(pieces) > 1 else pieces[0])
 
-        if self.keyarg_name:
+        if spec.keyarg_name:
             usage.append('[--<key>=<value>...]')
 
         # build the arguments which don't have default value
-        usage.extend('<%s>' % name.replace('_', '-') for name in self.arg_names[:-len(self.arg_defaults) or None])
+        usage.extend('<%s>' % name.replace('_', '-') for name in spec.arg_names[:-len(spec.arg_defaults) or None])
 
-        if self.vararg_name:
-            usage.append('[<%s>...]' % self.vararg_name.replace('_', '-'))
+        if spec.vararg_name:
+            usage.append('[<%s>...]' % spec.vararg_name.replace('_', '-'))
 
-        if without_name:
-            return '%s' % ' '.join(usage)
-        else:
-            return '%s %s' % ((self.name or self.func.__name__).replace('_', '-'), ' '.join(usage))
+        return ' '.join(usage)
 
     get_usage = build_usage
     '''
@@ -448,11 +1031,38 @@ class Command(object):
     '''
 
 
-CMD_SUFFIX = re.compile('^(?P<name>.*?)_cmd$')
+def _spec_property(name):
+
+    def fget(self):
+        return getattr(self.spec, name)
+
+    def fset(self, val):
+        setattr(self.spec, name, val)
+
+    return property(fget, fset, doc='It is kept in the shared :py:attr:`Command.spec`.')
+
+for _name in CommandSpec.__slots__ + ('arg_name_set', ):
+    setattr(Command, _name, _spec_property(_name))
+del _name
+
+def iter_batch(f):
+    '''Iterate the command lines of a batch file `f`.
+
+    :rtype: (lineno, line)
+
+    .. versionadded:: 0.4
+    '''
+
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line or line.startswith('#'): continue
+        yield (lineno, line)
+
+CMD_SUFFIX = LazyRegex('^(?P<name>.*?)_cmd$')
 '''
 It matches the function whose name ends with ``_cmd``.
 
-The regex is ``^(?P<name>.*?)_cmd$``.
+The regex is ``^(?P<name>.*?)_cmd$``. It is compiled at the first use.
 
 Usually, it is used with :py:func:`start`:
 
@@ -498,6 +1108,28 @@ class Program(object):
     :param debug: It will print a full traceback if it is True.
     :type name: bool
 
+    :param cache: Cache the command table and the help texts of a module on disk, so the next start doesn't need to introspect the functions again. See :py:meth:`Program.build_help`. The cache is invalidated when the mtime or size of the source, or of a source which defines the commands, is changed, or when the content is changed if it is ``'hash'``.
+    :type cache: bool or str
+
+    :param buffer_size: the buffer size of the output in bytes
+    :type buffer_size: int
+
+    :param flush: the flush policy of the output; See :py:class:`~clime.output.Writer`.
+    :type flush: str, int, float or None
+
+    :param stream_varargs: Pass the arbitrary arguments of commands as lazy iterators. It can be a list of command names. See :py:meth:`Command.iter_varargs`.
+    :type stream_varargs: bool or list
+
+    :param response_files: Expand the raw arguments ``@path`` of commands to the arguments in the files. It can be a list of command names. The command name and ``--help`` should be given in the command line. See :py:mod:`clime.response`.
+    :type response_files: bool or list
+
+    :param tracer: It times the phases. If it is None and the environment variable ``CLIME_TIMING`` is set, it prints a summary of the phases to `stderr` at exit. See :py:mod:`clime.tracing`.
+    :type tracer: :py:class:`~clime.tracing.Tracer`
+
+    .. versionadded:: 0.4
+        Added `cache`, `buffer_size`, `flush`, `stream_varargs`, `response_files` and `tracer`. The :py:class:`Command` objects are built lazily and
+        kept in :py:attr:`Program.commands`. See :py:meth:`Program.get_command`.
+
     .. versionchanged:: 0.3
         The ``-h`` option also triggers help text now.
 
@@ -517,56 +1149,333 @@ class Program(object):
        It is almost rewritten.
     '''
 
-    def __init__(self, obj=None, default=None, white_list=None, white_pattern=None, black_list=None, ignore_help=False, ignore_return=False, name=None, doc=None, debug=False):
+    def __init__(self, obj=None, default=None, white_list=None, white_pattern=None, black_list=None, ignore_help=False, ignore_return=False, name=None, doc=None, debug=False, cache=False, buffer_size=65536, flush=None, stream_varargs=False, response_files=False, tracer=None):
 
         obj = obj or sys.modules['__main__']
         self.obj = obj
 
-        if hasattr(obj, 'items'):
-            obj_items = obj.items()
-        else:
-            obj_items = inspect.getmembers(obj)
+        self.white_list = white_list
+        self.white_pattern = white_pattern
+        self.black_list = black_list
+        self.cache = cache
+        self._default = default
+
+        self.ignore_help = ignore_help
+        self.ignore_return = ignore_return
+        self.name = name or basename(sys.argv[0])
+        self.doc = doc
+        self.debug = debug
+        self.buffer_size = buffer_size
+        self.flush = flush
+        self.stream_varargs = stream_varargs
+        self.response_files = response_files
+
+        if tracer is None and os.environ.get('CLIME_TIMING', '0') != '0':
+            from .tracing import SummaryTracer
+            tracer = SummaryTracer()
+        self.tracer = tracer
+
+        self.discover()
+
+    def discover(self):
+        '''Find the commands out from the object of this program.
+
+        It is called by the construction, and it drops all of the built
+        commands.
+
+        .. versionadded:: 0.4
+        '''
+
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.timer()
+
+        obj = self.obj
+        white_list = self.white_list
+        white_pattern = self.white_pattern
+        black_list = self.black_list
 
         if not white_list and hasattr(obj, '__all__'):
             white_list = obj.__all__
 
-        tests = (inspect.isbuiltin, inspect.isfunction, inspect.ismethod)
+        self._reset_state()
+
+        # try to take the command table from the cache
+        cache_key = None
+        if self.cache and isinstance(obj, ModuleType):
+            from . import cache as _cache
+            cache_key = {
+                'white_list': sorted(white_list) if white_list is not None else None,
+                'white_pattern': white_pattern.pattern if white_pattern else None,
+                'black_list': sorted(black_list) if black_list is not None else None,
+            }
+            self._cache_key = cache_key
+            check = 'hash' if self.cache == 'hash' else 'mtime'
+            data = _cache.load(obj, cache_key, check)
+            if isinstance(data, dict):
+                try:
+                    for cmd_name, attr_name, meta in data['table']:
+                        self.command_funcs[cmd_name] = getattr(obj, attr_name)
+                        self.command_metas[cmd_name] = meta
+                except (AttributeError, KeyError):
+                    # the module is changed without changing its source
+                    self.command_funcs.clear()
+                    self.command_metas.clear()
+                else:
+                    self._cache_data = data
+                    cache_key = None
+
+        if not self.command_funcs:
+
+            if hasattr(obj, 'items'):
+                obj_items = obj.items()
+            elif isinstance(obj, ModuleType):
+                # same as `inspect.getmembers` for a module, but cheaper
+                obj_items = list(vars(obj).items())
+            else:
+                import inspect
+                obj_items = inspect.getmembers(obj)
+
+            func_types = (BuiltinFunctionType, FunctionType, MethodType)
+
+            attr_names = {}
+            for obj_name, obj in obj_items:
+
+                attr_name = obj_name
+
+                if obj_name.startswith('_'): continue
+                if not isinstance(obj, func_types): continue
+                if white_list is not None and obj_name not in white_list: continue
+                if black_list is not None and obj_name in black_list: continue
+
+                if white_pattern:
+                    match = white_pattern.match(obj_name)
+                    if not match: continue
+                    obj_name = match.group('name')
+
+                self.command_funcs[obj_name] = obj
+                attr_names[obj_name] = attr_name
+
+            if cache_key is not None:
+                # introspect all of the commands and save them for next time
+                self.build_commands()
+                self._cache_data = {
+                    'table': [
+                        (cmd_name, attr_names[cmd_name], cmd.dump_meta())
+                        for cmd_name, cmd in sorted(self.commands.items())
+                    ],
+                }
+                # the functions imported from the other modules are cached,
+                # too, so their sources also invalidate the cache
+                _cache.dump(
+                    self.obj, cache_key, self._cache_data,
+                    _cache.get_dep_paths(self.obj, self.command_funcs.values())
+                )
+
+        self.default = self._default
+        if len(self.command_funcs) == 1:
+            self.default = list(self.command_funcs.keys())[0]
+
+        if tracer is not None:
+            tracer.emit('discover', start, commands=len(self.command_funcs))
+
+    def _reset_state(self):
+        # drop everything found or built from the object; a subclass which
+        # overrides discover calls it, too
 
         self.command_funcs = {}
-        for obj_name, obj in obj_items:
 
-            if obj_name.startswith('_'): continue
-            if not any(test(obj) for test in tests): continue
-            if white_list is not None and obj_name not in white_list: continue
-            if black_list is not None and obj_name in black_list: continue
+        # the Command objects are built lazily; see get_command
+        self.commands = {}
+        self.command_metas = {}
 
-            if white_pattern:
-                match = white_pattern.match(obj_name)
-                if not match: continue
-                obj_name = match.group('name')
+        # the help texts are rendered lazily; see build_help
+        self.help_texts = {}
+        self._command_index = None
+        self._command_ngrams = None
+        self._cache_key = None
+        self._cache_data = None
 
-            self.command_funcs[obj_name] = obj
+    def reload(self):
+        '''Reload the module of this program and find the commands again.
+        See :py:func:`clime.util.reload_module`.
 
-        self.default = default
-        if len(self.command_funcs) == 1:
-            self.default = list(self.command_funcs.keys())[0]
+        .. versionadded:: 0.4
+        '''
 
-        self.ignore_help = ignore_help
-        self.ignore_return = ignore_return
-        self.name = name or basename(sys.argv[0])
-        self.doc = doc
-        self.debug = debug
+        from .util import reload_module
+        self.obj = reload_module(self.obj)
+        self.discover()
+
+    def get_command(self, cmd_name):
+        '''Get the :py:class:`Command` of `cmd_name`.
+
+        The command is built at the first time it is required, and then it is
+        kept in :py:attr:`Program.commands`, so a function is introspected at
+        most once.
+
+        :param cmd_name: a command name
+        :type cmd_name: str
+        :rtype: :py:class:`Command`
+
+        .. versionadded:: 0.4
+        '''
+
+        cmd = self.commands.get(cmd_name)
+        if cmd is None:
+
+            tracer = self.tracer
+            if tracer is not None:
+                start = tracer.timer()
+
+            cmd = Command(
+                self.command_funcs[cmd_name], cmd_name,
+                **self._get_command_options(cmd_name)
+            )
+            self.commands[cmd_name] = cmd
+
+            if tracer is not None:
+                cmd.tracer = tracer
+                tracer.emit('build', start, command=cmd_name)
+
+        return cmd
+
+    def _get_command_options(self, cmd_name):
+        # the arguments of Command except the function and the name; the
+        # workers of clime.jobs build the commands by them, too
+
+        stream_varargs = self.stream_varargs
+        if not isinstance(stream_varargs, bool):
+            stream_varargs = cmd_name in stream_varargs
+        response_files = self.response_files
+        if not isinstance(response_files, bool):
+            response_files = cmd_name in response_files
+
+        return {
+            'meta': self.command_metas.get(cmd_name),
+            'stream_varargs': stream_varargs,
+            'response_files': response_files,
+        }
+
+    def build_commands(self, cmd_names=None):
+        '''Build the :py:class:`Command` objects in advance.
+
+        :param cmd_names: the command names; By default, it builds all of the commands.
+        :type cmd_names: list
+
+        .. versionadded:: 0.4
+        '''
+
+        if cmd_names is None:
+            cmd_names = self.command_funcs.keys()
+        for cmd_name in cmd_names:
+            self.get_command(cmd_name)
+
+    def drop_commands(self, cmd_names=None):
+        '''Drop the built :py:class:`Command` objects. They will be built
+        again when they are required.
+
+        :param cmd_names: the command names; By default, it drops all of the commands.
+        :type cmd_names: list
+
+        .. versionadded:: 0.4
+        '''
+
+        if cmd_names is None:
+            self.commands.clear()
+            return
+        for cmd_name in cmd_names:
+            self.commands.pop(cmd_name, None)
 
     def complain(self, msg):
         '''Print `msg` with the name of this program to `stderr`.'''
         print('%s: %s' % (self.name, msg), file=sys.stderr)
 
+    clime_value_options = ('batch', 'jobs', 'serve', 'profile', 'profile-top')
+    '''The reserved options which take a value. The reserved options start with
+    ``--clime-`` and are only recognized before the command name.
+
+    .. versionadded:: 0.4
+    '''
+
+    clime_flag_options = ('unordered', 'threads')
+    '''The reserved options which don't take a value.
+
+    .. versionadded:: 0.4
+    '''
+
+    def pop_clime_options(self, raw_args):
+        '''Pop the reserved options out from the head of `raw_args`.
+
+        :param raw_args: the raw arguments
+        :type raw_args: list
+        :rtype: dict
+
+        .. versionadded:: 0.4
+        '''
+
+        clime_opts = {}
+
+        while raw_args and raw_args[0].startswith('--clime-'):
+
+            key, eq_str, val = raw_args.pop(0)[len('--clime-'):].partition('=')
+
+            if key in self.clime_value_options:
+                if not eq_str:
+                    if not raw_args:
+                        raise ValueError('option --clime-%s requires a value' % key)
+                    val = raw_args.pop(0)
+            elif key in self.clime_flag_options:
+                if eq_str:
+                    raise ValueError("option --clime-%s doesn't take a value" % key)
+                val = True
+            else:
+                raise ValueError('unknown option --clime-%s' % key)
+
+            clime_opts[key] = val
+
+        return clime_opts
+
     def main(self, raw_args=None):
         '''Start to parse the raw arguments and send them to a
         :py:class:`~clime.core.Command` instance.
 
         :param raw_args: The arguments from command line. By default, it takes from ``sys.argv``.
         :type raw_args: list
+
+        It also accepts the reserved options before the command name:
+
+        ``--clime-batch FILE``
+            Read a command line per line from `FILE` (``-`` means `stdin`), and
+            execute them one by one in this process. See
+            :py:meth:`Program.run_batch`.
+
+        ``--clime-jobs N``
+            Execute the batch by `N` workers; 0 means the number of CPUs. It
+            reads `stdin` if ``--clime-batch`` isn't given.
+
+        ``--clime-unordered``
+            Print the outputs of the batch in the order of completion.
+
+        ``--clime-threads``
+            Use a thread pool instead of a process pool.
+
+        ``--clime-serve SOCKET``
+            Serve this program on the Unix domain socket `SOCKET`. See
+            :py:mod:`clime.server`.
+
+        ``--clime-profile TARGET``
+            Run the command under `cProfile`, and print the time of the phases
+            of clime and the command to `stderr`. If `TARGET` is ``-``, it
+            prints the top functions, too; otherwise, it dumps the profile to
+            the path `TARGET` for `pstats`. See :py:mod:`clime.profiling`.
+
+        ``--clime-profile-top N``
+            Print the top `N` functions of the profile. It is 20 by default.
+
+        .. versionchanged:: 0.4
+            Added the reserved options. It prints the exception and exits with
+            status 1 if a command fails and `debug` is off.
         '''
 
         if raw_args is None:
@@ -574,6 +1483,190 @@ class Program(object):
         elif isinstance(raw_args, str):
             raw_args = raw_args.split()
 
+        try:
+            clime_opts = self.pop_clime_options(raw_args)
+        except ValueError as e:
+            self.complain(e)
+            sys.exit(2)
+
+        if 'serve' in clime_opts:
+            from .server import serve
+            serve(self, clime_opts['serve'])
+            return
+
+        if 'batch' in clime_opts or 'jobs' in clime_opts:
+            try:
+                jobs = int(clime_opts.get('jobs', 1))
+            except ValueError:
+                self.complain('option --clime-jobs requires an integer')
+                sys.exit(2)
+            ok = self.run_batch(
+                clime_opts.get('batch', '-'),
+                jobs=jobs,
+                ordered=not clime_opts.get('unordered'),
+                threads=bool(clime_opts.get('threads'))
+            )
+            if not ok:
+                sys.exit(1)
+            return
+
+        if 'profile' in clime_opts:
+            try:
+                top = int(clime_opts.get('profile-top', 20))
+            except ValueError:
+                self.complain('option --clime-profile-top requires an integer')
+                sys.exit(2)
+            from .profiling import profile_main
+            profile_main(self, raw_args, clime_opts['profile'], top)
+            return
+
+        self.run(raw_args)
+
+    def run(self, raw_args):
+        '''Execute the raw arguments and output the return value. If the
+        command fails and `debug` is off, it prints the exception and exits
+        with status 1.
+
+        :param raw_args: the raw arguments without the reserved options
+        :type raw_args: list
+
+        .. versionadded:: 0.4
+        '''
+
+        try:
+            # execute the command with the raw arguments
+            return_val = self.execute(raw_args)
+        except ParseError as e:
+
+            if self.debug:
+                raise
+
+            self.complain(e)
+            sys.exit(2)
+
+        except Exception as e:
+
+            if self.debug:
+                raise
+
+            self.complain('exception: {}: {}'.format(
+                e.__class__.__name__,
+                e
+            ))
+            sys.exit(1)
+
+        self.output(return_val)
+
+    def execute(self, raw_args):
+        '''Find the command in the raw arguments and execute it.
+
+        :param raw_args: the raw arguments
+        :type raw_args: list
+        :rtype: the return value of the command, or None if it prints usage.
+
+        .. versionadded:: 0.4
+        '''
+
+        tracer = self.tracer
+        if tracer is not None:
+            start = tracer.timer()
+
+        cmd_name, need_help = self.route(raw_args)
+
+        if tracer is not None:
+            tracer.emit('lookup', start, command=cmd_name)
+
+        if need_help:
+            self.print_usage(cmd_name)
+            return
+
+        return self.get_command(cmd_name).execute(raw_args)
+
+    def lookup(self, name):
+        '''Find the command name of `name`. It can be a unique prefix of a
+        command name, such as ``dep`` of ``deploy``.
+
+        The command names are indexed by :py:class:`~clime.util.PrefixIndex`
+        at the first time a prefix is used, so it stays fast with a huge
+        number of commands.
+
+        :param name: a command name or a prefix of it from the command line
+        :type name: str
+        :rtype: str or None if nothing is found
+        :raises ParseError: if `name` is an ambiguous prefix
+
+        .. versionadded:: 0.4
+        '''
+
+        name = name.replace('-', '_')
+        if name in self.command_funcs:
+            return name
+
+        if not name or name.startswith('_'):
+            return None
+
+        index = self._command_index
+        if index is None:
+            index = self._command_index = PrefixIndex(self.command_funcs)
+
+        # two names are enough to know it is ambiguous
+        cmd_names = index.find(name, limit=2)
+        if len(cmd_names) == 1:
+            return cmd_names[0]
+        if cmd_names:
+            candidates = [
+                cmd_name.replace('_', '-')
+                for cmd_name in index.find(name, limit=11)
+            ]
+            raise ParseError("ambiguous command '%s': %s" % (
+                name.replace('_', '-'), format_candidates(candidates)
+            ), candidates)
+
+        return None
+
+    def suggest(self, name, limit=3):
+        '''Suggest the command names similar to an unknown command `name`.
+
+        The command names are indexed by :py:class:`~clime.util.NgramIndex`
+        at the first time, so it doesn't compare `name` with all of them.
+
+        :param name: an unknown command name from the command line
+        :type name: str
+        :param limit: suggest at most `limit` command names
+        :type limit: int
+        :rtype: list
+
+        .. versionadded:: 0.4
+        '''
+
+        index = self._command_ngrams
+        if index is None:
+            index = self._command_ngrams = NgramIndex(self.command_funcs)
+
+        return [
+            cmd_name.replace('_', '-')
+            for _, cmd_name in index.find(name.replace('-', '_'))[:limit]
+        ]
+
+    def route(self, raw_args):
+        '''Find the command name in the head of the raw arguments and pop it.
+
+        :param raw_args: the raw arguments
+        :type raw_args: list
+        :rtype: (cmd_name, need_help)
+
+        If `need_help` is True, the usage of `cmd_name` should be printed; None
+        means the usage of all commands. Otherwise, `cmd_name` is the command
+        to execute with the rest of the raw arguments.
+
+        The command name can be a unique prefix if the program has no default
+        command. See :py:meth:`Program.lookup`. If there is no default command,
+        an unknown command name raises :py:class:`ParseError` with the similar
+        command names. See :py:meth:`Program.suggest`.
+
+        .. versionadded:: 0.4
+        '''
+
         # try to find a command name in the raw arguments.
         cmd_name = None
         cmd_func = None
@@ -581,59 +1674,183 @@ class Program(object):
         if len(raw_args) == 0:
             pass
         elif not self.ignore_help and raw_args[0] in ('--help', '-h'):
-            self.print_usage()
-            return
+            return (None, True)
         else:
-            cmd_func = self.command_funcs.get(raw_args[0].replace('-', '_'))
-            if cmd_func is not None:
-                cmd_name = raw_args.pop(0).replace('-', '_')
+            # a prefix is only completed if the program has no default
+            # command, since it may be an argument of the default command
+            if self.default:
+                cmd_name = raw_args[0].replace('-', '_')
+                if cmd_name not in self.command_funcs:
+                    cmd_name = None
+            else:
+                cmd_name = self.lookup(raw_args[0])
+            if cmd_name is not None:
+                cmd_func = self.command_funcs[cmd_name]
+                raw_args.pop(0)
 
         if cmd_func is None:
             # we can't find a command name in normal procedure
-            if self.default:
-                cmd_name = cmd_name
-                cmd_func = self.command_funcs[self.default]
-            else:
-                self.print_usage()
-                return
+            if not self.default:
+                if raw_args and not raw_args[0].startswith('-'):
+                    raise did_you_mean(
+                        "unknown command '%s'" % raw_args[0],
+                        self.suggest(raw_args[0])
+                    )
+                return (None, True)
 
         if not self.ignore_help and '--help' in raw_args:
             # the user requires help of this command
-            self.print_usage(cmd_name)
-            return
+            return (cmd_name, True)
+
+        return (cmd_name or self.default, False)
+
+    def output(self, return_val):
+        '''Print the return value of a command to `stdout` by a
+        :py:class:`~clime.output.Writer`.
+
+        If the reader of `stdout` is gone, such as ``| head``, it exits quietly.
+
+        .. versionadded:: 0.4
+        '''
+
+        if not self.ignore_return and return_val is not None:
+
+            tracer = self.tracer
+            if tracer is not None:
+                start = tracer.timer()
+
+            from .output import Writer, BrokenPipe, silence_stdout
+
+            try:
+                Writer(sys.stdout, self.buffer_size, self.flush).write_return(return_val)
+            except BrokenPipe:
+                silence_stdout()
+                sys.exit(1)
 
-        # convert the function to a Command object
-        cmd = Command(cmd_func, cmd_name)
+            if tracer is not None:
+                tracer.emit('output', start)
 
+    def run_batch(self, path, jobs=1, ordered=True, threads=False):
+        '''Execute a command line per line of `path`.
+
+        The lines are split like a shell does. The empty lines and the lines
+        start with ``#`` are skipped. The output of a line is flushed when the
+        line is done. If a line fails, it prints the exception with the line
+        number and goes on with the next line.
+
+        :param path: the path of a file; ``-`` means `stdin`
+        :type path: str
+        :param jobs: the number of workers; 0 means the number of CPUs. If it is 1, the lines are executed in this process.
+        :type jobs: int
+        :param ordered: If it is False, the outputs are printed in the order of completion instead of the order of input.
+        :type ordered: bool
+        :param threads: Use a thread pool instead of a process pool.
+        :type threads: bool
+        :rtype: bool; False if any line failed.
+
+        .. versionadded:: 0.4
+
+        .. seealso::
+            :py:func:`clime.jobs.run_jobs` describes how the lines are executed
+            in parallel.
+        '''
+
+        f = sys.stdin if path == '-' else open(path)
         try:
-            # execute the command with the raw arguments
-            return_val = cmd.execute(raw_args)
-        except BaseException as e:
+            lines = iter_batch(f)
+            if jobs != 1:
+                from .jobs import run_jobs
+                return run_jobs(self, lines, jobs, ordered, threads)
+            return self._run_batch(lines)
+        finally:
+            if f is not sys.stdin:
+                f.close()
 
-            if self.debug:
-                raise
+    def _run_batch(self, lines):
+
+        import shlex
+
+        ok = True
+
+        for lineno, line in lines:
 
-                self.complain('exception: {}: {}'.format(
+            try:
+                self.output(self.execute(shlex.split(line)))
+            except Exception as e:
+
+                if self.debug:
+                    raise
+
+                self.complain('line {}: exception: {}: {}'.format(
+                    lineno,
                     e.__class__.__name__,
                     e
                 ))
-                sys.exit(1)
-            return
+                ok = False
 
-        if not self.ignore_return and return_val is not None:
-            if inspect.isgenerator(return_val):
-                for i in return_val:
-                    print(i)
-            else:
-                print(return_val)
+            sys.stdout.flush()
+
+        return ok
 
     def print_usage(self, cmd_name=None):
-        '''Print the usage(s) of all commands or a command.'''
+        '''Print the usage(s) of all commands or a command.
+
+        .. versionchanged:: 0.4
+            It prints the text built by :py:meth:`Program.build_help`.
+        '''
+
+        print(self.build_help(cmd_name), end='')
+
+    def build_help(self, cmd_name=None):
+        '''Build the help text of all commands or a command.
+
+        The text is kept in :py:attr:`Program.help_texts`. If the program is
+        built with `cache`, the text is also kept in the cache of the module,
+        so the next ``--help`` only reads the cache instead of building the
+        commands. It is invalidated with the command table.
+
+        :param cmd_name: a command name; None means all commands
+        :type cmd_name: str
+        :rtype: str
+
+        .. versionadded:: 0.4
+        '''
+
+        text = self.help_texts.get(cmd_name)
+        if text is not None:
+            return text
+
+        data = self._cache_data
+        if data is None:
+            text = self._build_help(cmd_name)
+        else:
+
+            # the help texts also depend on the default command and the doc
+            help_key = {'default': self.default, 'doc': self.doc}
+            helps = data.get('helps')
+            if not isinstance(helps, dict) or helps.get('key') != help_key:
+                helps = data['helps'] = {'key': help_key, 'texts': {}}
+
+            # the keys of JSON are strings
+            text_key = cmd_name or ''
+            text = helps['texts'].get(text_key)
+            if text is None:
+                text = self._build_help(cmd_name)
+                helps['texts'][text_key] = text
+                from . import cache as _cache
+                _cache.dump(
+                    self.obj, self._cache_key, data,
+                    _cache.get_dep_paths(self.obj, self.command_funcs.values())
+                )
+
+        self.help_texts[cmd_name] = text
+        return text
+
+    def _build_help(self, cmd_name):
 
         def append_usage(cmd_name, without_name=False):
             # nonlocal usages
-            cmd_func = self.command_funcs[cmd_name]
-            usages.append(Command(cmd_func, cmd_name).build_usage(without_name))
+            usages.append(self.get_command(cmd_name).build_usage(without_name))
 
         usages = []
 
@@ -649,23 +1866,19 @@ class Program(object):
                 append_usage(cmd_name, without_name=True)
             append_usage(cmd_name)
 
-        # print the usages
-        iusages = iter(usages)
-        try:
-            print('usage:', next(iusages))
-        except StopIteration:   # Empty usages; print nothing.
-            pass
-        else:
-            for usage in iusages:
-                print('   or:', usage)
+        # render the usages
+        lines = []
+        for i, usage in enumerate(usages):
+            lines.append('%s %s' % ('   or:' if i else 'usage:', usage))
 
         # find the doc
+        import inspect
 
         # find the module-level doc
         if cmd_name is None:
             if self.doc:
                 doc = self.doc
-            elif inspect.ismodule(self.obj):
+            elif isinstance(self.obj, ModuleType):
                 doc = inspect.getdoc(self.obj)
             else:
                 doc = None
@@ -677,11 +1890,11 @@ class Program(object):
         if cmd_name:
             doc = inspect.getdoc(self.command_funcs[cmd_name])
 
-        # print the doc
+        # render the doc
         if doc:
-            print()
-            print(doc)
-            print()
+            lines.extend(['', doc, ''])
+
+        return ''.join(line+'\n' for line in lines)
 
 def start(*args, **kargs):
     '''It is same as ``Program(*args, **kargs).main()``.
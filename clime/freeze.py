@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It freezes a program into a generated module, which has the command table,
+the introspected information and the usages of the commands, so it starts
+without any introspection.
+
+Freeze a module by ``clime freeze``: ::
+
+    $ clime freeze repeat.py --output=repeat_cli.py
+    $ python repeat_cli.py --times=3 thrice
+
+The generated module still imports the source module to get the functions. If
+the source, or the source of a module which defines the commands, is changed,
+the generated module runs the source by the normal
+:py:class:`~clime.core.Program`, and writes itself again for the next time.
+By default, the source is checked by its mtime and size. If the mtime isn't
+kept, such as copying to other hosts, use ``--check=hash``.
+
+.. versionadded:: 0.4
+'''
+
+import os
+
+from .core import Program
+from .util import load_module
+from .cache import get_source_path, get_dep_paths, check_source, hash_source
+
+TEMPLATE = '''\
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# It is generated by ``clime freeze`` from {source_name}. Don't edit it; it is
+# written again when the source is changed.
+
+SOURCE = {source!r}
+MODULE = {module!r}
+CHECK = {check!r}
+SOURCE_INFO = {source_info!r}
+DEPS = {deps!r}
+OPTIONS = {options!r}
+DOC = {doc!r}
+
+TABLE = {table}
+
+def main(raw_args=None):
+    from clime.freeze import run_frozen
+    return run_frozen(globals(), raw_args)
+
+if __name__ == '__main__':
+    main()
+'''
+
+class FrozenProgram(Program):
+    '''A :py:class:`~clime.core.Program` which takes its commands from a
+    frozen table instead of discovering them.
+
+    :param obj: the module of the functions
+    :type obj: module
+    :param table: a list of (command name, attribute name, information)
+    :type table: list
+
+    The other arguments are same as :py:class:`~clime.core.Program`.
+    '''
+
+    def __init__(self, obj, table, **kargs):
+        self.table = table
+        Program.__init__(self, obj, **kargs)
+
+    def discover(self):
+
+        obj = self.obj
+        self._reset_state()
+
+        for cmd_name, attr_name, meta in self.table:
+            self.command_funcs[cmd_name] = getattr(obj, attr_name)
+            self.command_metas[cmd_name] = meta
+
+        self.default = self._default
+        if len(self.command_funcs) == 1:
+            self.default = list(self.command_funcs.keys())[0]
+
+def get_check_info(source_path, check):
+    '''Get the information of `source_path` which :py:func:`clime.cache.check_source` checks.'''
+
+    if check == 'hash':
+        return {'hash': hash_source(source_path)}
+    stat = os.stat(source_path)
+    return {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+def build_module(module, output_path, check='mtime', options=None):
+    '''Build the source of the frozen module of `module`.
+
+    :param module: the module to freeze
+    :type module: module
+    :param output_path: the path of the frozen module; The path of the source is kept relative to it.
+    :type output_path: str
+    :param check: ``'mtime'`` or ``'hash'``; See :py:func:`clime.cache.check_source`.
+    :type check: str
+    :param options: the arguments of :py:class:`~clime.core.Program`, such as `white_list` and `default`; They should be literals, since they are written into the frozen module.
+    :type options: dict
+    :rtype: str
+    '''
+
+    import pprint
+    import inspect
+
+    options = options or {}
+
+    source_path = get_source_path(module)
+    if source_path is None:
+        raise ValueError("can't find the source of %s" % module.__name__)
+
+    prog = Program(module, **options)
+    prog.build_commands()
+
+    table = []
+    for cmd_name, cmd in sorted(prog.commands.items()):
+        attr_name = cmd.func.__name__
+        if getattr(module, attr_name, None) is not cmd.func:
+            attr_name = next(
+                name for name, val in vars(module).items() if val is cmd.func
+            )
+        table.append((cmd_name, attr_name, cmd.dump_meta()))
+
+    output_dir_path = os.path.dirname(os.path.abspath(output_path))
+
+    # the sources of the functions imported from the other modules
+    deps = []
+    for dep_path in get_dep_paths(module, prog.command_funcs.values()):
+        dep_info = get_check_info(dep_path, check)
+        dep_info['path'] = os.path.relpath(os.path.abspath(dep_path), output_dir_path)
+        deps.append(dep_info)
+
+    # a module in a package is imported by its name; the others are loaded
+    # from their files
+    module_name = module.__name__
+    if '.' not in module_name:
+        module_name = None
+
+    return TEMPLATE.format(
+        source_name=os.path.basename(source_path),
+        source=os.path.relpath(os.path.abspath(source_path), output_dir_path),
+        module=module_name,
+        check=check,
+        source_info=get_check_info(source_path, check),
+        deps=deps,
+        options=options,
+        doc=options.get('doc') or inspect.getdoc(module),
+        table=pprint.pformat(table),
+    )
+
+def write_module(module, output_path, check='mtime', options=None):
+    '''Write the frozen module of `module` to `output_path`. It writes to a
+    temporary file first, so a running frozen module never reads a partial
+    file.
+
+    :rtype: str
+    '''
+
+    code = build_module(module, output_path, check, options)
+
+    tmp_path = '%s.%d.tmp' % (output_path, os.getpid())
+    with open(tmp_path, 'w') as f:
+        f.write(code)
+    os.rename(tmp_path, output_path)
+
+    return output_path
+
+def run_frozen(namespace, raw_args=None):
+    '''Run the frozen program of the generated module. It is called by the
+    ``main`` of a generated module with its `namespace`.
+
+    :param namespace: the globals of the generated module
+    :type namespace: dict
+    '''
+
+    frozen_path = os.path.abspath(namespace['__file__'])
+    if frozen_path.endswith(('.pyc', '.pyo')):
+        frozen_path = frozen_path[:-1]
+    source_path = os.path.join(os.path.dirname(frozen_path), namespace['SOURCE'])
+
+    module = load_module(namespace['MODULE'] or source_path)
+
+    check = namespace['CHECK']
+    try:
+        fresh = check_source(source_path, namespace['SOURCE_INFO'], check) and all(
+            check_source(os.path.join(os.path.dirname(frozen_path), dep_info['path']), dep_info, check)
+            for dep_info in namespace.get('DEPS', ())
+        )
+    except (IOError, OSError):
+        fresh = False
+
+    options = namespace['OPTIONS']
+
+    if fresh:
+        kargs = dict(options, doc=namespace['DOC'])
+        for key in ('white_list', 'white_pattern', 'black_list'):
+            kargs.pop(key, None)
+        prog = FrozenProgram(module, namespace['TABLE'], **kargs)
+    else:
+        prog = Program(module, **options)
+        try:
+            write_module(module, frozen_path, check, options)
+        except (IOError, OSError):
+            pass
+
+    prog.main(raw_args)
+    return prog
@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It executes the command lines of a batch in parallel.
+
+The commands are sent to a process pool by the module and the name of their
+functions, so a worker imports nothing per task and builds a
+:py:class:`~clime.core.Command` only once. It is built with the same options
+as :py:meth:`~clime.core.Program.get_command`, such as `response_files`. If a function can't be found by its
+module and name, such as a lambda in a mapping, it uses a thread pool instead.
+
+On the platforms which support `fork`, the workers are forked from this
+process. Otherwise, the main module should protect its entry point with
+``if __name__ == '__main__':``.
+
+.. versionadded:: 0.4
+'''
+
+from __future__ import print_function
+
+import sys
+import errno
+import shlex
+import threading
+import traceback
+from collections import deque
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+from .core import Command
+from .output import Writer, BrokenPipe, silence_stdout
+
+class LocalStdout(object):
+    '''A proxy of `stdout` which writes into a buffer of the current thread if
+    it has one.'''
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.local = threading.local()
+
+    def __getattr__(self, name):
+        buf = getattr(self.local, 'buf', None)
+        return getattr(self.stdout if buf is None else buf, name)
+
+class Capture(object):
+    '''Capture what is written to `stdout` in this thread.'''
+
+    def __enter__(self):
+        self.buf = StringIO()
+        if isinstance(sys.stdout, LocalStdout):
+            self.local = sys.stdout.local
+            self.local.buf = self.buf
+        else:
+            self.local = None
+            self.stdout = sys.stdout
+            sys.stdout = self.buf
+        return self.buf
+
+    def __exit__(self, *exc_info):
+        if self.local is not None:
+            self.local.buf = None
+        else:
+            sys.stdout = self.stdout
+
+# the commands built in a worker; (module name, function name, command name) -> Command
+worker_commands = {}
+
+def execute_by_name(module_name, func_name, cmd_name, options, raw_args, ignore_return):
+    '''Execute a command in a worker.
+
+    :param options: the other arguments of :py:class:`~clime.core.Command`
+    :type options: dict
+    :rtype: (output, error, formatted traceback)
+    '''
+
+    key = (module_name, func_name, cmd_name)
+    cmd = worker_commands.get(key)
+    if cmd is None:
+        __import__(module_name)
+        func = getattr(sys.modules[module_name], func_name)
+        cmd = worker_commands[key] = Command(func, cmd_name, **options)
+
+    return execute(cmd, raw_args, ignore_return)
+
+def execute(cmd, raw_args, ignore_return):
+    '''Execute a :py:class:`~clime.core.Command` and capture its output.
+
+    :rtype: (output, error, formatted traceback)
+    '''
+
+    try:
+        with Capture() as buf:
+            return_val = cmd.execute(raw_args)
+            if not ignore_return and return_val is not None:
+                # the buffer is in memory already, so flush every item to keep
+                # the order with what the command prints
+                Writer(buf, flush='item').write_return(return_val)
+    except Exception as e:
+        return (buf.getvalue(), '{}: {}'.format(e.__class__.__name__, e), traceback.format_exc())
+
+    return (buf.getvalue(), None, None)
+
+def find_by_name(func):
+    '''Find the module name and the name of `func`, or None if `func` can't be
+    found by them.'''
+
+    module_name = getattr(func, '__module__', None)
+    func_name = getattr(func, '__name__', None)
+    module = sys.modules.get(module_name)
+    if module is None or getattr(module, func_name, None) is not func:
+        return None
+    return (module_name, func_name)
+
+def create_executor(prog, jobs, threads):
+
+    import concurrent.futures
+
+    if jobs == 0:
+        import multiprocessing
+        jobs = multiprocessing.cpu_count()
+
+    if not threads:
+        threads = not all(find_by_name(func) for func in prog.command_funcs.values())
+
+    if threads:
+        return (concurrent.futures.ThreadPoolExecutor(jobs), jobs)
+
+    import multiprocessing
+    kargs = {}
+    if 'fork' in multiprocessing.get_all_start_methods():
+        kargs['mp_context'] = multiprocessing.get_context('fork')
+    return (concurrent.futures.ProcessPoolExecutor(jobs, **kargs), jobs)
+
+def run_jobs(prog, lines, jobs, ordered=True, threads=False):
+    '''Execute the command lines of a batch in parallel.
+
+    The command name of each line is found in this process, and the usage is
+    printed here, too. The rest is executed in the workers. The outputs are
+    printed in the order of `lines` if `ordered` is True, or in the order of
+    completion otherwise. Only a bounded number of lines is read ahead.
+
+    :param prog: the program
+    :type prog: :py:class:`~clime.core.Program`
+    :param lines: the (lineno, line) pairs
+    :type lines: iterable
+    :param jobs: the number of workers; 0 means the number of CPUs.
+    :type jobs: int
+    :param ordered: print the outputs in the input order
+    :type ordered: bool
+    :param threads: use a thread pool instead of a process pool
+    :type threads: bool
+    :rtype: bool; False if any line failed.
+    '''
+
+    import concurrent.futures
+
+    executor, jobs = create_executor(prog, jobs, threads)
+    threads = isinstance(executor, concurrent.futures.ThreadPoolExecutor)
+
+    failed = []
+
+    def submit(raw_args):
+
+        cmd_name, need_help = prog.route(raw_args)
+
+        if need_help:
+            future = concurrent.futures.Future()
+            with Capture() as buf:
+                prog.print_usage(cmd_name)
+            future.set_result((buf.getvalue(), None, None))
+            return future
+
+        if threads:
+            return executor.submit(execute, prog.get_command(cmd_name), raw_args, prog.ignore_return)
+
+        module_name, func_name = find_by_name(prog.command_funcs[cmd_name])
+        return executor.submit(
+            execute_by_name,
+            module_name, func_name, cmd_name, prog._get_command_options(cmd_name),
+            raw_args, prog.ignore_return
+        )
+
+    def emit(lineno, future):
+
+        try:
+            output, error, tb = future.result()
+        except Exception as e:
+            output, error, tb = ('', '{}: {}'.format(e.__class__.__name__, e), None)
+
+        if output:
+            try:
+                sys.stdout.write(output)
+                sys.stdout.flush()
+            except (IOError, OSError) as e:
+                if e.errno != errno.EPIPE:
+                    raise
+                raise BrokenPipe()
+
+        if error is not None:
+            if prog.debug and tb:
+                sys.stderr.write(tb)
+            prog.complain('line {}: exception: {}'.format(lineno, error))
+            failed.append(lineno)
+
+    stdout = sys.stdout
+    if threads:
+        sys.stdout = LocalStdout(stdout)
+
+    window = jobs * 4
+    pending = deque()
+    futures = {}
+
+    try:
+        for lineno, line in lines:
+
+            try:
+                future = submit(shlex.split(line))
+            except Exception as e:
+                future = concurrent.futures.Future()
+                future.set_result(('', '{}: {}'.format(e.__class__.__name__, e), None))
+
+            if ordered:
+                pending.append((lineno, future))
+                while len(pending) >= window:
+                    emit(*pending.popleft())
+            else:
+                futures[future] = lineno
+                if len(futures) >= window:
+                    done, _ = concurrent.futures.wait(
+                        futures, return_when=concurrent.futures.FIRST_COMPLETED
+                    )
+                    for future in done:
+                        emit(futures.pop(future), future)
+
+        while pending:
+            emit(*pending.popleft())
+
+        for future in concurrent.futures.as_completed(futures):
+            emit(futures[future], future)
+
+    except BrokenPipe:
+        silence_stdout()
+        sys.exit(1)
+
+    finally:
+        sys.stdout = stdout
+        executor.shutdown()
+
+    return not failed
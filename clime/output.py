@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It writes the return values of commands to `stdout`.
+
+.. versionadded:: 0.4
+'''
+
+import os
+import sys
+import time
+import errno
+from types import GeneratorType
+
+from .util import isasyncgen
+
+try:
+    text_type = unicode
+except NameError:
+    text_type = str
+
+class BrokenPipe(Exception):
+    '''The reader of the stream is gone.'''
+
+class Writer(object):
+    '''A buffered writer for the return values of commands.
+
+    A return value is written as a line. The items of a generator are written
+    as lines, too. A `str` is encoded by the encoding of the stream, and
+    `bytes` are written as they are. Anything else is converted by `str`.
+
+    :param stream: the stream; By default, it is ``sys.stdout``.
+    :type stream: file-like object
+    :param buffer_size: flush when the buffer exceeds this size in bytes
+    :type buffer_size: int
+    :param flush: the flush policy; ``'item'`` flushes every item, an `int` N flushes every N items, a `float` flushes the buffered items once the producer of a generator is idle for this many seconds, and None only flushes when the buffer is full. By default, it is ``'item'`` if the stream is a terminal, otherwise None.
+    :type flush: str, int, float or None
+
+    When the reader of the stream is gone (``EPIPE``), such as ``| head``,
+    :py:meth:`Writer.write_return` closes the generator and raises
+    :py:class:`BrokenPipe`.
+    '''
+
+    def __init__(self, stream=None, buffer_size=65536, flush=None):
+
+        self.stream = stream or sys.stdout
+        self.buffer_size = buffer_size
+
+        if flush is None:
+            try:
+                isatty = self.stream.isatty()
+            except (AttributeError, ValueError):
+                isatty = False
+            if isatty:
+                flush = 'item'
+
+        self.every = None
+        self.idle = None
+        if flush == 'item':
+            self.every = 1
+        elif isinstance(flush, float):
+            self.idle = flush
+        elif isinstance(flush, int):
+            self.every = flush
+        elif flush is not None:
+            raise ValueError('unknown flush policy: %r' % (flush, ))
+
+        # write bytes to the binary buffer of a text stream if it has one
+        self.binary = getattr(self.stream, 'buffer', None)
+        self.encoding = getattr(self.stream, 'encoding', None) or 'utf-8'
+        self.errors = getattr(self.stream, 'errors', None) or 'strict'
+
+        self.parts = []
+        self.size = 0
+        self.count = 0
+        self.last = time.time()
+
+        # it flushes the idle buffer while a generator is written
+        self.idle_flusher = None
+
+    def to_bytes(self, item):
+        if isinstance(item, bytes):
+            return item
+        if not isinstance(item, text_type):
+            item = text_type(item)
+        return item.encode(self.encoding, self.errors)
+
+    def to_text(self, item):
+        if isinstance(item, bytes) and bytes is not str:
+            return item.decode(self.encoding, 'replace')
+        if not isinstance(item, (str, text_type)):
+            item = str(item)
+        return item
+
+    def write(self, item):
+        '''Write an item as a line.'''
+
+        if self.binary is not None:
+            data = self.to_bytes(item)+b'\n'
+        else:
+            data = self.to_text(item)+'\n'
+
+        idle_flusher = self.idle_flusher
+        if idle_flusher is None:
+            self._write(data)
+        else:
+            with idle_flusher.cond:
+                idle_flusher.check()
+                self._write(data)
+                idle_flusher.cond.notify()
+
+    def _write(self, data):
+
+        self.parts.append(data)
+        self.size += len(data)
+        self.count += 1
+        self.last = time.time()
+
+        if (
+            self.size >= self.buffer_size or
+            self.every and self.count % self.every == 0
+        ):
+            self._flush()
+
+    def flush(self):
+        '''Write the buffered items to the stream and flush it.'''
+
+        idle_flusher = self.idle_flusher
+        if idle_flusher is None:
+            self._flush()
+        else:
+            with idle_flusher.cond:
+                idle_flusher.check()
+                self._flush()
+
+    def _flush(self):
+
+        if not self.parts:
+            return
+
+        try:
+            if self.binary is not None:
+                # keep the order with the text written to the stream
+                self.stream.flush()
+                self.binary.write(b''.join(self.parts))
+                self.binary.flush()
+            else:
+                self.stream.write(''.join(self.parts))
+                self.stream.flush()
+        except (IOError, OSError) as e:
+            if e.errno == errno.EPIPE:
+                raise BrokenPipe()
+            raise
+        finally:
+            self.parts = []
+            self.size = 0
+
+    def write_return(self, return_val):
+        '''Write a return value, and flush at last.
+
+        The items of a generator or an asynchronous generator are written one
+        by one, and the generator is closed at last.
+        '''
+
+        isasync = isasyncgen(return_val)
+        if not isasync and not isinstance(return_val, GeneratorType):
+            self.write(return_val)
+            self.flush()
+            return
+
+        # flush the buffer before anything else is printed by the generator
+        stdout = sys.stdout
+        if stdout is self.stream:
+            sys.stdout = FlushingStream(stdout, self)
+
+        if self.idle is not None:
+            self.idle_flusher = IdleFlusher(self)
+
+        try:
+            if isasync:
+                from .aio import run, write_all
+                run(write_all(self, return_val))
+            else:
+                for item in return_val:
+                    self.write(item)
+            self.flush()
+        finally:
+            if self.idle_flusher is not None:
+                self.idle_flusher.stop()
+                self.idle_flusher = None
+            sys.stdout = stdout
+            if not isasync:
+                return_val.close()
+
+class IdleFlusher(object):
+    '''A thread which flushes a :py:class:`Writer` once nothing is written to
+    it for :py:attr:`Writer.idle` seconds, so the items are shown while the
+    producer is blocked. The writer and the thread share :py:attr:`cond`.
+
+    :param writer: the writer
+    :type writer: :py:class:`Writer`
+    '''
+
+    def __init__(self, writer):
+
+        import threading
+
+        self.writer = writer
+        self.cond = threading.Condition()
+        self.error = None
+        self.stopped = False
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+
+        writer = self.writer
+
+        with self.cond:
+            while not self.stopped:
+
+                if not writer.parts or self.error is not None:
+                    self.cond.wait()
+                    continue
+
+                timeout = writer.last + writer.idle - time.time()
+                if timeout > 0:
+                    self.cond.wait(timeout)
+                    continue
+
+                try:
+                    writer._flush()
+                except Exception as e:
+                    # raise it in the thread of the writer
+                    self.error = e
+
+    def check(self):
+        '''Raise the error of the last flush in the thread, if any.'''
+
+        error = self.error
+        if error is not None:
+            self.error = None
+            raise error
+
+    def stop(self):
+        '''Stop the thread and wait for it.'''
+
+        with self.cond:
+            self.stopped = True
+            self.cond.notify()
+        self.thread.join()
+
+class FlushingStream(object):
+    '''A proxy of a stream which flushes a :py:class:`Writer` before writing.'''
+
+    def __init__(self, stream, writer):
+        self.stream = stream
+        self.writer = writer
+
+    def write(self, s):
+        self.writer.flush()
+        return self.stream.write(s)
+
+    def writelines(self, lines):
+        self.writer.flush()
+        return self.stream.writelines(lines)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def silence_stdout():
+    '''Redirect `stdout` to the null device, so Python doesn't complain about
+    the broken pipe when it flushes `stdout` at exit.'''
+
+    try:
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        os.close(devnull)
+    except (AttributeError, ValueError, OSError):
+        pass
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It profiles a command of a program by `cProfile`, and separates the
+overhead of clime from the function of the command.
+
+It is used by the ``--clime-profile`` option of
+:py:meth:`~clime.core.Program.main`::
+
+    $ python repeat.py --clime-profile=- repeat hello
+    $ python repeat.py --clime-profile=repeat.pstats repeat hello
+
+The phases of clime are found by their functions in the profile:
+
+``discover``
+    :py:meth:`~clime.core.Program.discover`. It runs again in the profile,
+    since the program discovered its commands before the option was read.
+
+``route``
+    :py:meth:`~clime.core.Program.route`, which finds the command name.
+
+``build``
+    :py:meth:`~clime.core.Program.get_command`, which builds the
+    :py:class:`~clime.core.Command`.
+
+``parse``
+    :py:meth:`~clime.core.Command.parse`, including the casting.
+
+``output``
+    :py:meth:`~clime.core.Program.output`, except the function of a generator
+    command, which runs while its items are written.
+
+.. versionadded:: 0.4
+'''
+
+from __future__ import print_function
+
+import sys
+import inspect
+
+from .core import Command, ParseError
+
+def func_key(func):
+    '''Get the key of `func` in `pstats.Stats.stats`.
+
+    :rtype: tuple or None if it isn't a Python function
+    '''
+
+    func = getattr(func, '__func__', func)
+    code = getattr(func, '__code__', None)
+    if code is None:
+        return None
+    return (code.co_filename, code.co_firstlineno, code.co_name)
+
+def builtin_keys(func):
+    name = getattr(func, '__name__', None)
+    return [
+        ('~', 0, '<built-in method %s>' % name),
+        ('~', 0, '<built-in function %s>' % name),
+    ]
+
+def cumulative_time(stats, keys):
+    '''Sum the cumulative seconds of the functions of `keys`.'''
+    return sum(stats.stats[key][3] for key in keys if key in stats.stats)
+
+def isgeneratorfunction(func):
+    if inspect.isgeneratorfunction(func):
+        return True
+    test = getattr(inspect, 'isasyncgenfunction', None)
+    return test is not None and test(func)
+
+def split_phases(stats, prog, func):
+    '''Split the total time of `stats` into the phases.
+
+    :param stats: the profile
+    :type stats: `pstats.Stats`
+    :param prog: the profiled program
+    :type prog: :py:class:`~clime.core.Program`
+    :param func: the function of the command, or None
+    :type func: callable
+    :rtype: list of (phase, seconds)
+    '''
+
+    phase_funcs = [
+        ('discover', [prog.discover]),
+        ('route', [prog.route]),
+        ('build', [prog.get_command]),
+        ('parse', [Command.parse]),
+        ('output', [prog.output]),
+    ]
+
+    phases = [
+        (phase, cumulative_time(stats, [func_key(f) for f in funcs]))
+        for phase, funcs in phase_funcs
+    ]
+
+    command_time = 0.0
+    if func is not None:
+        key = func_key(func)
+        command_time = cumulative_time(stats, [key] if key else builtin_keys(func))
+        if isgeneratorfunction(func):
+            phases = [
+                (phase, seconds-command_time if phase == 'output' else seconds)
+                for phase, seconds in phases
+            ]
+
+    phases.append(('command', command_time))
+    return phases
+
+def print_summary(phases, total, name, file=None):
+    '''Print the phases and the overhead of clime.'''
+
+    file = file or sys.stderr
+    command_time = dict(phases)['command']
+    overhead = total - command_time
+
+    print('clime profile: %.3f ms in total' % (total*1e3), file=file)
+    for phase, seconds in phases:
+        label = phase
+        if phase == 'command':
+            label = 'command (%s)' % name
+        print('    %-24s %10.3f ms' % (label, seconds*1e3), file=file)
+    print('    %-24s %10.3f ms (%.1f%%)' % (
+        'clime overhead',
+        overhead*1e3,
+        overhead / total * 100 if total else 0.0
+    ), file=file)
+
+def profile_main(prog, raw_args, target='-', top=20):
+    '''Run `raw_args` by `prog` under `cProfile`.
+
+    :param prog: the program
+    :type prog: :py:class:`~clime.core.Program`
+    :param raw_args: the raw arguments without the reserved options
+    :type raw_args: list
+    :param target: a path to dump the `pstats` file; ``-`` prints the `top`
+                   functions to `stderr` instead
+    :type target: str
+    :param top: the number of functions to print
+    :type top: int
+
+    The summary of the phases is always printed to `stderr`, even if the
+    command fails.
+    '''
+
+    import cProfile
+    import pstats
+
+    try:
+        cmd_name, need_help = prog.route(list(raw_args))
+    except ParseError:
+        # it is reported by `prog.run` below
+        cmd_name, need_help = None, True
+    func = None
+    if not need_help:
+        func = prog.command_funcs.get(cmd_name)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        prog.discover()
+        prog.run(raw_args)
+    finally:
+        profiler.disable()
+
+        # the output should be flushed before the report
+        sys.stdout.flush()
+
+        stats = pstats.Stats(profiler, stream=sys.stderr)
+        phases = split_phases(stats, prog, func)
+        print_summary(phases, stats.total_tt, cmd_name)
+
+        if target == '-':
+            print(file=sys.stderr)
+            stats.sort_stats('cumulative').print_stats(top)
+        else:
+            stats.dump_stats(target)
+            print('clime profile: written to %s' % target, file=sys.stderr)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It expands the response files in the raw arguments.
+
+A raw argument ``@path`` is replaced by the arguments in the file `path`. The
+arguments are separated by whitespace, including newlines, and quoted like a
+shell: ::
+
+    --name "Mosky Liu" --note 'it is a "note"'
+    # a comment to the end of the line
+    a\\ b  c
+
+The file is memory-mapped and tokenized lazily, so the arguments are fed to
+:py:meth:`~clime.core.Command.parse` one by one without a full list of them.
+The arguments in a response file aren't expanded again, and ``@@`` escapes a
+leading ``@``.
+
+It is turned on by the `response_files` of :py:class:`~clime.core.Command` or
+:py:class:`~clime.core.Program`. A value which starts with ``@``, such as
+``@data.json`` of a ``<json>`` option, should be written as
+``--key=@data.json`` then.
+
+.. versionadded:: 0.4
+'''
+
+import sys
+
+from .util import LazyRegex, _map_file
+
+token_re = LazyRegex(br'''(?xs)
+    (?P<comment> \#[^\n]* )
+  | (?P<continuation> \\\n )
+  | (?P<token> (?: [^\s'"\\]+ | '[^']*' | "(?:[^"\\]|\\.)*" | \\. )+ )
+  | (?P<error> ['"\\] )
+''')
+'''It finds the comments, the line continuations between the tokens and the
+tokens in a response file.'''
+
+piece_re = LazyRegex(br'''(?xs)
+    '(?P<single> [^']* )'
+  | "(?P<double> (?:[^"\\]|\\.)* )"
+  | \\(?P<escaped> . )
+  | (?P<plain> [^'"\\]+ )
+''')
+'''It splits a token into the quoted and the plain pieces.'''
+
+double_escape_re = LazyRegex(br'\\([\\"$`\n])')
+'''The escapes in double quotes, like a POSIX shell.'''
+
+if sys.version_info[0] >= 3:
+    def decode(b):
+        return b.decode('utf-8', 'surrogateescape')
+else:
+    def decode(b):
+        return b
+
+def _drop_newline(m):
+    c = m.group(1)
+    return b'' if c == b'\n' else c
+
+def unquote(token):
+    '''Remove the quotes and the escapes of a token.
+
+    :param token: a raw token
+    :type token: bytes
+    :rtype: bytes
+    '''
+
+    pieces = []
+    for m in piece_re.finditer(token):
+        kind = m.lastgroup
+        piece = m.group(kind)
+        if kind == 'double':
+            piece = double_escape_re.sub(_drop_newline, piece)
+        elif kind == 'escaped' and piece == b'\n':
+            # a line continuation
+            piece = b''
+        pieces.append(piece)
+    return b''.join(pieces)
+
+def tokenize(data):
+    '''Yield the arguments in `data` lazily.
+
+    :param data: the content of a response file
+    :type data: bytes or a buffer, such as `mmap.mmap`
+    :rtype: iterator of str
+    '''
+
+    for m in token_re.finditer(data):
+
+        kind = m.lastgroup
+        if kind == 'comment' or kind == 'continuation':
+            continue
+
+        token = m.group(kind)
+        if kind == 'error':
+            if token == b'\\':
+                raise ValueError('no escaped character at the end of a response file')
+            raise ValueError('no closing quotation in a response file')
+
+        if b"'" in token or b'"' in token or b'\\' in token:
+            token = unquote(token)
+        yield decode(token)
+
+def iter_file(path):
+    '''Yield the arguments in the response file `path` lazily.
+
+    :rtype: iterator of str
+    '''
+
+    data = _map_file(path)
+    try:
+        for arg in tokenize(data):
+            yield arg
+    finally:
+        if not isinstance(data, bytes):
+            data.close()
+
+def expand(raw_args):
+    '''Yield `raw_args` with the response files expanded lazily.
+
+    :param raw_args: the raw arguments
+    :type raw_args: iterable
+    :rtype: iterator of str
+    '''
+
+    for raw_arg in raw_args:
+        if raw_arg.startswith('@@'):
+            yield raw_arg[1:]
+        elif raw_arg.startswith('@') and len(raw_arg) > 1:
+            for arg in iter_file(raw_arg[1:]):
+                yield arg
+        else:
+            yield raw_arg
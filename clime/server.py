@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It serves a :py:class:`~clime.core.Program` on a Unix domain socket.
+
+The server imports the module and builds all of the commands once. A client,
+see :py:mod:`clime.client`, sends its arguments, working directory, environment
+and the file descriptors of its `stdin`, `stdout` and `stderr`. The server forks
+a child for each request, and the child runs the command with them, so the
+output goes to the client directly. The exit status is sent back at last.
+
+If the source of the module is changed, the module is reloaded before the next
+request.
+
+It requires Python 3 and a platform which supports `fork` and Unix domain
+sockets.
+
+.. versionadded:: 0.4
+'''
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import stat
+import array
+import signal
+import struct
+import socket
+import traceback
+from os.path import basename
+
+HEADER = struct.Struct('!I')
+STATUS = struct.Struct('!i')
+
+def recv_exactly(conn, size, data=b''):
+    '''Receive until `data` is `size` bytes.'''
+
+    while len(data) < size:
+        chunk = conn.recv(size-len(data))
+        if not chunk:
+            raise EOFError('connection closed')
+        data += chunk
+    return data
+
+def send_request(conn, argv, cwd, env, fds):
+    '''Send a request with the file descriptors `fds`.'''
+
+    body = json.dumps({'argv': argv, 'cwd': cwd, 'env': env}).encode('utf-8')
+    conn.sendmsg(
+        [HEADER.pack(len(body)), body],
+        [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', fds))]
+    )
+
+def recv_request(conn):
+    '''Receive a request.
+
+    :rtype: (request, fds)
+    '''
+
+    fds = array.array('i')
+    data, ancdata, _, _ = conn.recvmsg(
+        HEADER.size, socket.CMSG_SPACE(3*fds.itemsize)
+    )
+
+    for level, type, cmsg_data in ancdata:
+        if level == socket.SOL_SOCKET and type == socket.SCM_RIGHTS:
+            fds.frombytes(cmsg_data[:len(cmsg_data)-len(cmsg_data) % fds.itemsize])
+
+    try:
+        size, = HEADER.unpack(recv_exactly(conn, HEADER.size, data))
+        request = json.loads(recv_exactly(conn, size).decode('utf-8'))
+    except BaseException:
+        for fd in fds:
+            os.close(fd)
+        raise
+
+    return (request, list(fds))
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return None
+
+def handle(prog, conn, request, fds):
+    '''Run a request in the forked child.
+
+    :rtype: the exit status
+    '''
+
+    for target_fd, fd in enumerate(fds[:3]):
+        os.dup2(fd, target_fd)
+    for fd in fds:
+        os.close(fd)
+
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+
+    argv = request['argv']
+    sys.argv = argv
+    if argv:
+        prog.name = basename(argv[0])
+
+    status = 0
+    try:
+        prog.main(argv[1:])
+    except SystemExit as e:
+        if e.code is None:
+            status = 0
+        elif isinstance(e.code, int):
+            status = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            status = 1
+    except BaseException:
+        traceback.print_exc()
+        status = 1
+
+    for f in (sys.stdout, sys.stderr):
+        try:
+            f.flush()
+        except (IOError, OSError):
+            pass
+
+    return status
+
+def serve(prog, path):
+    '''Serve `prog` on the Unix domain socket at `path` until it is
+    interrupted.
+
+    :param prog: the program
+    :type prog: :py:class:`~clime.core.Program`
+    :param path: the path of the socket
+    :type path: str
+    '''
+
+    from .cache import get_source_path
+
+    prog.build_commands()
+
+    source_path = get_source_path(prog.obj)
+    mtime = get_mtime(source_path)
+
+    # remove the stale socket
+    try:
+        if stat.S_ISSOCK(os.stat(path).st_mode):
+            os.remove(path)
+    except OSError:
+        pass
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(128)
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+
+    term_handler = signal.signal(signal.SIGTERM, terminate)
+
+    try:
+        while True:
+
+            conn, _ = listener.accept()
+
+            # reap the finished children
+            try:
+                while os.waitpid(-1, os.WNOHANG)[0]:
+                    pass
+            except OSError:
+                pass
+
+            try:
+                request, fds = recv_request(conn)
+            except (EOFError, OSError, ValueError):
+                conn.close()
+                continue
+
+            new_mtime = get_mtime(source_path)
+            if new_mtime != mtime:
+                mtime = new_mtime
+                try:
+                    prog.reload()
+                    prog.build_commands()
+                except Exception:
+                    traceback.print_exc()
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+
+            pid = os.fork()
+            if pid == 0:
+                status = 1
+                try:
+                    signal.signal(signal.SIGTERM, term_handler)
+                    listener.close()
+                    status = handle(prog, conn, request, fds)
+                    conn.sendall(STATUS.pack(status))
+                finally:
+                    os._exit(status)
+
+            conn.close()
+            for fd in fds:
+                os.close(fd)
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        signal.signal(signal.SIGTERM, term_handler)
+        listener.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
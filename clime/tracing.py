@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+'''It times the phases of a program and sends them to callbacks as spans.
+
+The phases are:
+
+``discover``
+    :py:meth:`~clime.core.Program.discover` finds the commands out.
+
+``lookup``
+    :py:meth:`~clime.core.Program.route` finds the command name.
+
+``build``
+    :py:meth:`~clime.core.Program.get_command` builds a
+    :py:class:`~clime.core.Command`. It only happens at the first time.
+
+``parse``
+    :py:meth:`~clime.core.Command.parse` parses the raw arguments. It
+    contains the ``cast`` phase.
+
+``cast``
+    The collected arguments are resolved and cast.
+
+``execute``
+    The function of the command runs, including its event loop if it is a
+    coroutine.
+
+``output``
+    :py:meth:`~clime.core.Program.output` writes the return value.
+
+A :py:class:`Tracer` is passed by the `tracer` of
+:py:class:`~clime.core.Program`. Without a tracer, the phases aren't timed at
+all. For example, it bridges to a tracing system: ::
+
+    def on_span(span):
+        print(span.phase, span.duration, span.info)
+
+    Program(tracer=Tracer(on_span)).main()
+
+The environment variable ``CLIME_TIMING`` turns on a
+:py:class:`SummaryTracer`, which prints the summary to `stderr` at exit: ::
+
+    $ CLIME_TIMING=1 python repeat.py hello
+
+.. versionadded:: 0.4
+'''
+
+from __future__ import print_function
+
+import sys
+import time
+
+timer = getattr(time, 'perf_counter', time.time)
+'''The high-resolution clock of the spans, in seconds.'''
+
+epoch_offset = time.time() - timer()
+'''Add it to a time of :py:data:`timer` to get a Unix time.'''
+
+class Span(object):
+    '''A timed phase.
+
+    :param phase: the name of the phase
+    :type phase: str
+    :param start: the start time by :py:data:`timer`
+    :type start: float
+    :param end: the end time by :py:data:`timer`
+    :type end: float
+    :param info: the details, such as the command name
+    :type info: dict
+    '''
+
+    __slots__ = ('phase', 'start', 'end', 'info')
+
+    def __init__(self, phase, start, end, info):
+        self.phase = phase
+        self.start = start
+        self.end = end
+        self.info = info
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return '<Span %s %.6fs %r>' % (self.phase, self.duration, self.info)
+
+class Tracer(object):
+    '''It receives the spans and calls the `callbacks` with them. A span is
+    sent when its phase ends, so the ``cast`` span comes before its ``parse``
+    span.
+
+    :param callbacks: callables taking a :py:class:`Span`
+    '''
+
+    timer = staticmethod(timer)
+
+    def __init__(self, *callbacks):
+        self.callbacks = list(callbacks)
+
+    def emit(self, phase, start, **info):
+        '''End a phase which started at `start`.
+
+        :rtype: :py:class:`Span`
+        '''
+
+        span = Span(phase, start, timer(), info)
+        for callback in self.callbacks:
+            callback(span)
+        return span
+
+class SummaryTracer(Tracer):
+    '''It sums the spans up by phases, and prints the summary to `file` at
+    exit.
+
+    :param file: a file; `stderr` by default
+    '''
+
+    phases = ('discover', 'lookup', 'build', 'parse', 'cast', 'execute', 'output')
+
+    def __init__(self, *callbacks, **kargs):
+        Tracer.__init__(self, *callbacks)
+        self.callbacks.append(self.add)
+        self.file = kargs.get('file')
+        self.count_map = {}
+        self.total_map = {}
+
+        import atexit
+        atexit.register(self.print_summary)
+
+    def add(self, span):
+        phase = span.phase
+        self.count_map[phase] = self.count_map.get(phase, 0) + 1
+        self.total_map[phase] = self.total_map.get(phase, 0.0) + span.duration
+
+    def print_summary(self):
+        '''Print the count and the total time of each phase.'''
+
+        if not self.count_map:
+            return
+
+        file = self.file or sys.stderr
+        print('clime timing:', file=file)
+        extra_phases = sorted(set(self.count_map) - set(self.phases))
+        for phase in list(self.phases) + extra_phases:
+            if phase not in self.count_map:
+                continue
+            print('    %-10s %6d %12.3f ms' % (
+                phase, self.count_map[phase], self.total_map[phase]*1e3
+            ), file=file)
@@ -3,27 +3,584 @@
 
 '''It contains the helper functions.'''
 
-import inspect
+import os
+import sys
+import types
+
+# The modules, such as `re` and `inspect`, are imported at the first use, so
+# `import clime` only costs a little.
+
+FunctionType = types.FunctionType
+MethodType = types.MethodType
+BuiltinFunctionType = types.BuiltinFunctionType
+ModuleType = types.ModuleType
+
+# it is a built-in function in Python 2
+intern = getattr(sys, 'intern', None) or intern
+
+class LazyRegex(object):
+    '''A regex which is compiled at the first use of it. It has the same
+    methods and attributes as a compiled regex.
+
+    :param pattern: the pattern
+    :type pattern: str
+    :param flags: the flags of `re.compile`
+    :type flags: int
+
+    .. versionadded:: 0.4
+    '''
+
+    def __init__(self, pattern, flags=0):
+        self.pattern = pattern
+        self.flags = flags
+        self._compiled = None
+
+    def compile(self):
+        '''Compile it if it isn't compiled.
+
+        :rtype: a compiled regex
+        '''
+        if self._compiled is None:
+            import re
+            self._compiled = re.compile(self.pattern, self.flags)
+        return self._compiled
+
+    def __getattr__(self, name):
+        # keep the bound method, so the next access is a plain lookup
+        val = getattr(self.compile(), name)
+        setattr(self, name, val)
+        return val
+
+    def __repr__(self):
+        return 'LazyRegex(%r)' % self.pattern
+
+json_backend_names = ('orjson', 'ujson', 'json')
+'''The JSON modules to try, fastest first.'''
+
+_json_backend = None
+
+def get_json_backend():
+    '''Get the first importable module of :py:data:`json_backend_names`. It
+    is resolved once.
+
+    .. versionadded:: 0.4
+    '''
+
+    global _json_backend
+    if _json_backend is None:
+        for name in json_backend_names:
+            try:
+                _json_backend = __import__(name)
+            except ImportError:
+                continue
+            break
+    return _json_backend
+
+def _open_stdin():
+    return getattr(sys.stdin, 'buffer', sys.stdin)
+
+def _map_file(path):
+    import mmap
+    # an empty file can't be mapped
+    with open(path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
 
 def json(s):
-    '''Convert a JSON string `s` into a Python's type.'''
-    import json
-    return json.loads(s)
+    '''Convert a JSON string `s` into a Python's type.
+
+    .. versionchanged:: 0.4
+        The ``@path`` reads the JSON from a file, and ``@-`` reads it from
+        stdin. The file is memory-mapped, and it is decoded by
+        :py:func:`get_json_backend`.
+    '''
+
+    backend = get_json_backend()
+
+    if not isinstance(s, str) or not s.startswith('@'):
+        return backend.loads(s)
+
+    path = s[1:]
+    if path == '-':
+        return backend.loads(_open_stdin().read())
+
+    payload = _map_file(path)
+    if not payload:
+        return backend.loads(payload)
+
+    try:
+        if backend.__name__ == 'orjson':
+            # decode the mapped pages in place
+            view = memoryview(payload)
+            try:
+                return backend.loads(view)
+            finally:
+                view.release()
+        return backend.loads(payload[:])
+    finally:
+        payload.close()
+
+def open_file(s):
+    '''Open the file at the path `s` (or ``@path``) for reading bytes. The
+    ``-`` or ``@-`` means stdin. The caller closes it.
+
+    .. versionadded:: 0.4
+    '''
+
+    if not isinstance(s, str):
+        return s
+    if s.startswith('@'):
+        s = s[1:]
+    if s == '-':
+        return _open_stdin()
+    return open(s, 'rb')
+
+def map_bytes(s):
+    '''Convert `s` into bytes. The ``@path`` maps the file into memory and
+    returns a read-only `mmap.mmap`, which supports slicing and the buffer
+    protocol like `bytes`. The ``@-`` reads stdin, and ``@@`` escapes a
+    leading ``@``.
+
+    .. versionadded:: 0.4
+    '''
+
+    if not isinstance(s, str):
+        return s
+
+    if s.startswith('@@'):
+        s = s[1:]
+    elif s == '@-':
+        return _open_stdin().read()
+    elif s.startswith('@'):
+        return _map_file(s[1:])
+
+    if isinstance(s, bytes):
+        return s
+    return s.encode('utf-8')
+
+autotype_number_lead_set = frozenset('0123456789+-.')
+'''The first characters of the strings which are converted by `int` or
+`float` directly.'''
+
+autotype_word_lead_set = frozenset('iInNtTfF')
+'''The first characters of the words in :py:data:`autotype_word_map`. The
+other strings, e.g. a path, are returned at once.'''
+
+autotype_word_map = {
+    'true': True, 'false': False, 'none': None, 'null': None,
+    'inf': float('inf'), 'infinity': float('inf'), 'nan': float('nan'),
+}
+'''The lowercase words which :py:func:`autotype` converts.'''
 
 def autotype(s):
-    '''Automatively detect the type (int, float or string) of `s` and convert
-    `s` into it.'''
+    '''Automatively detect the type (int, float, bool, None or string) of `s`
+    and convert `s` into it.
+
+    .. versionchanged:: 0.4
+        A string which starts with a digit, a sign or a dot is converted by
+        `int` or `float` directly, and the others are looked up in
+        :py:data:`autotype_word_map`. A negative integer becomes an `int`.
+        The ``true``, ``false``, ``none`` and ``null`` (case-insensitive)
+        become `True`, `False` and `None`.
+    '''
 
     if not isinstance(s, str):
         return s
 
     if s.isdigit():
-        return int(s)
+        try:
+            return int(s)
+        except ValueError:
+            # the digits like '²'
+            return s
 
-    try:
-        return float(s)
-    except ValueError:
-        return s
+    c = s[:1]
+    if c in autotype_number_lead_set:
+        if c in '+-':
+            try:
+                return int(s)
+            except ValueError:
+                pass
+        try:
+            return float(s)
+        except ValueError:
+            return s
+
+    if c in autotype_word_lead_set and len(s) <= 8:
+        return autotype_word_map.get(s.lower(), s)
+
+    return s
+
+def autotype_all(vals):
+    '''Apply :py:func:`autotype` to each value of `vals`.
+
+    :rtype: list
+
+    .. versionadded:: 0.4
+    '''
+
+    return [autotype(s) for s in vals]
+
+class ArrayCaster(object):
+    '''Cast comma-separated values or a sequence of values into a compact
+    array in one step. It makes a NumPy array if NumPy is installed, otherwise
+    an `array.array`.
+
+    :param typecode: the type code of `array.array`
+    :type typecode: str
+
+    .. versionadded:: 0.4
+    '''
+
+    typecode_map = {
+        'n': 'q', 'num': 'q', 'number': 'q',
+        'i': 'q', 'int': 'q', 'integer': 'q',
+        'i8': 'b', 'int8': 'b', 'u8': 'B', 'uint8': 'B',
+        'i16': 'h', 'int16': 'h', 'u16': 'H', 'uint16': 'H',
+        'i32': 'i', 'int32': 'i', 'u32': 'I', 'uint32': 'I',
+        'i64': 'q', 'int64': 'q', 'u64': 'Q', 'uint64': 'Q',
+        'f': 'd', 'float': 'd', 'f64': 'd', 'float64': 'd', 'double': 'd',
+        'f32': 'f', 'float32': 'f',
+    }
+    '''It maps the element part of an array metavar to a type code.'''
+
+    prefer_numpy = True
+    '''Make NumPy arrays if NumPy is installed.'''
+
+    _numpy = None
+
+    def __init__(self, typecode):
+        self.typecode = typecode
+        self.type = float if typecode in 'fd' else int
+
+    @classmethod
+    def from_meta(cls, meta):
+        '''Make an :py:class:`ArrayCaster` from a normalized metavar, such as
+        ``int[]``, ``float64[]`` or ``f32...``.
+
+        :rtype: :py:class:`ArrayCaster` or None if it isn't an array metavar
+        '''
+
+        if not meta:
+            return None
+
+        for suffix in ('[]', '...'):
+            if meta.endswith(suffix):
+                typecode = cls.typecode_map.get(meta[:-len(suffix)])
+                if typecode is not None:
+                    return cls(typecode)
+
+        return None
+
+    @classmethod
+    def get_numpy(cls):
+        if not cls.prefer_numpy:
+            return None
+        if cls._numpy is None:
+            try:
+                import numpy
+            except ImportError:
+                numpy = False
+            cls._numpy = numpy
+        return cls._numpy or None
+
+    def __call__(self, s):
+        '''Cast comma-separated values.'''
+        if not isinstance(s, str):
+            return s
+        return self.cast_all([s])
+
+    def cast_all(self, vals):
+        '''Cast a sequence of values. Each value can be comma-separated, too,
+        and the commas at its ends are ignored.
+
+        The values are parsed into the array directly, without a Python object
+        for each element. An empty or invalid element raises
+        :py:class:`~clime.core.ParseError`.
+        '''
+
+        numpy = self.get_numpy()
+        if numpy is not None:
+
+            stripped = (val.strip(',') for val in vals)
+            joined = ','.join(val for val in stripped if val)
+            dtype = numpy.dtype(self.typecode)
+            if not joined:
+                return numpy.empty(0, dtype)
+
+            # it stops at an invalid element with a warning or an error, so
+            # compare the lengths
+            import warnings
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                try:
+                    arr = numpy.fromstring(joined, dtype=dtype, sep=',')
+                except (ValueError, DeprecationWarning):
+                    arr = None
+            if arr is None or len(arr) != joined.count(',')+1:
+                self._raise_invalid(vals)
+            return arr
+
+        import array
+        arr = array.array(self.typecode)
+        cast = self.type
+        try:
+            for val in vals:
+                val = val.strip(',')
+                if val:
+                    arr.extend(map(cast, val.split(',')))
+        except (ValueError, OverflowError):
+            self._raise_invalid(vals)
+        return arr
+
+    def _raise_invalid(self, vals):
+        # find the invalid element out; it is only for the error message
+
+        import array
+        from .core import ParseError
+
+        i = 0
+        for val in vals:
+            val = val.strip(',')
+            if not val: continue
+            for part in val.split(','):
+                try:
+                    array.array(self.typecode, [self.type(part)])
+                except (ValueError, OverflowError):
+                    raise ParseError('invalid element %d of the %s array: %r' % (
+                        i, self.type.__name__, part
+                    ))
+                i += 1
+
+        raise ParseError('invalid %s array: %r' % (self.type.__name__, ','.join(vals)))
+
+class PrefixIndex(object):
+    '''A sorted index of names to find the names which start with a prefix.
+    A lookup bisects the index, so it costs O(log n) plus the names found,
+    even if there are tens of thousands of names.
+
+    :param names: the names
+    :type names: iterable
+
+    .. versionadded:: 0.4
+    '''
+
+    def __init__(self, names):
+        self.names = sorted(names)
+
+    def iter_names(self, prefix):
+        '''Iterate the names which start with `prefix` in order.
+
+        :rtype: iterator of str
+        '''
+
+        from bisect import bisect_left
+
+        names = self.names
+        i = bisect_left(names, prefix)
+        while i < len(names) and names[i].startswith(prefix):
+            yield names[i]
+            i += 1
+
+    def find(self, prefix, limit=None):
+        '''Find the names which start with `prefix`.
+
+        :param limit: find at most `limit` names
+        :type limit: int
+        :rtype: list
+        '''
+
+        names = []
+        for name in self.iter_names(prefix):
+            if limit is not None and len(names) >= limit:
+                break
+            names.append(name)
+        return names
+
+def edit_distance(a, b, limit=None):
+    '''Compute the edit distance between `a` and `b`. It is the
+    Levenshtein distance which also counts a transposition of two adjacent
+    characters as one edit, so ``stauts`` is one edit from ``status``.
+
+    :param limit: stop early and return ``limit+1`` if the distance is over it
+    :type limit: int
+    :rtype: int
+
+    .. versionadded:: 0.4
+    '''
+
+    if limit is None:
+        # the distance is never over it
+        limit = max(len(a), len(b))
+    elif abs(len(a)-len(b)) > limit:
+        return limit + 1
+
+    # only the cells within `limit` of the diagonal are computed; the others
+    # are over `limit`
+    over = limit + 1
+    before_previous = None
+    previous = [j if j <= limit else over for j in range(len(b)+1)]
+    for i in range(1, len(a)+1):
+        current = [over] * (len(b)+1)
+        if i <= limit:
+            current[0] = i
+        for j in range(max(1, i-limit), min(len(b), i+limit)+1):
+            distance = min(
+                previous[j] + 1,
+                current[j-1] + 1,
+                previous[j-1] + (a[i-1] != b[j-1])
+            )
+            if i > 1 and j > 1 and a[i-1] == b[j-2] and a[i-2] == b[j-1]:
+                distance = min(distance, before_previous[j-2] + 1)
+            current[j] = min(distance, over)
+
+        # a transposition may come from the row before the previous one
+        if min(current) > limit and min(previous) > limit:
+            return over
+
+        before_previous, previous = previous, current
+
+    return previous[-1]
+
+class NgramIndex(object):
+    '''An index of names by their n-grams to find the names similar to a
+    name without comparing all of them.
+
+    An edit changes at most ``n+1`` n-grams, so a name within `k` edits
+    misses at most ``(n+1)*k`` distinct n-grams of the query. A candidate must
+    contain one of the ``(n+1)*k+1`` rarest n-grams of the query, and enough
+    of the others, before it is compared by :py:func:`edit_distance`.
+
+    :param names: the names
+    :type names: iterable
+    :param n: the length of an n-gram
+    :type n: int
+
+    .. versionadded:: 0.4
+    '''
+
+    def __init__(self, names, n=3):
+        self.n = n
+        self.names = list(names)
+        self.posting_map = {}
+        for name in self.names:
+            for gram in set(self.split(name)):
+                self.posting_map.setdefault(gram, []).append(name)
+
+    def split(self, name):
+        '''Split `name` into the n-grams. It is padded, so the heads and the
+        tails are also n-grams.
+
+        :rtype: list
+        '''
+
+        n = self.n
+        padded = '\0'*(n-1) + name + '\0'*(n-1)
+        return [padded[i:i+n] for i in range(len(padded)-n+1)]
+
+    def find(self, name, max_distance=None):
+        '''Find the names within `max_distance` edits of `name`.
+
+        :param max_distance: By default, it finds the names within 1 edit,
+                             and then 2 edits if nothing is found and `name`
+                             has 10 characters or more.
+        :type max_distance: int
+        :rtype: a list of (distance, name); the nearest first
+        '''
+
+        if max_distance is None:
+            found = self.find(name, 1)
+            if not found and len(name) >= 10:
+                found = self.find(name, 2)
+            return found
+
+        posting_map = self.posting_map
+        gram_set = set(self.split(name))
+        grams = sorted(gram_set, key=lambda gram: len(posting_map.get(gram, ())))
+
+        n_misses = (self.n+1) * max_distance
+        if len(grams) <= n_misses:
+            candidates = self.names
+            min_shared = 0
+        else:
+            candidates = set()
+            for gram in grams[:n_misses+1]:
+                candidates.update(posting_map.get(gram, ()))
+            min_shared = len(grams) - n_misses
+
+        found = []
+        for candidate in candidates:
+            if abs(len(candidate)-len(name)) > max_distance:
+                continue
+            if min_shared and len(gram_set.intersection(self.split(candidate))) < min_shared:
+                continue
+            distance = edit_distance(name, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+
+        found.sort()
+        return found
+
+def iscoroutine(obj):
+    '''Return True if `obj` is a coroutine. It is always False before Python
+    3.5.'''
+    coroutine_type = getattr(types, 'CoroutineType', None)
+    return coroutine_type is not None and isinstance(obj, coroutine_type)
+
+def isasyncgen(obj):
+    '''Return True if `obj` is an asynchronous generator. It is always False
+    before Python 3.6.'''
+    asyncgen_type = getattr(types, 'AsyncGeneratorType', None)
+    return asyncgen_type is not None and isinstance(obj, asyncgen_type)
+
+CO_VARARGS = 0x04
+CO_VARKEYWORDS = 0x08
+
+def _getargspec(func):
+    # read the code object directly, which is what `inspect` does, without
+    # importing `inspect`
+    code = getattr(func, '__code__', None)
+    if code is None:
+        import inspect
+        return tuple(inspect.getfullargspec(func)[:4])
+
+    arg_len = code.co_argcount
+    names = code.co_varnames
+    args = list(names[:arg_len])
+    arg_len += getattr(code, 'co_kwonlyargcount', 0)
+
+    varargs = None
+    if code.co_flags & CO_VARARGS:
+        varargs = names[arg_len]
+        arg_len += 1
+
+    keywords = None
+    if code.co_flags & CO_VARKEYWORDS:
+        keywords = names[arg_len]
+
+    return (args, varargs, keywords, func.__defaults__)
+
+def getkwonlyargs(func):
+    '''Get the names of the keyword-only arguments of `func`. They are
+    always empty before Python 3.
+
+    :param func: The target.
+    :type func: a python function, built-in function or bound method
+    :rtype: list
+
+    .. versionadded:: 0.4
+    '''
+
+    if isinstance(func, MethodType):
+        func = func.__func__
+
+    code = getattr(func, '__code__', None)
+    if not isinstance(func, FunctionType) or code is None:
+        return []
+
+    start = code.co_argcount
+    return list(code.co_varnames[start:start+getattr(code, 'co_kwonlyargcount', 0)])
 
 def getargspec(func):
     '''Get the argument specification of `func`.
@@ -41,14 +598,16 @@ def getargspec(func):
     .. versionadded:: 0.1.3
     '''
 
-    if inspect.isfunction(func):
-        return inspect.getargspec(func)
+    if isinstance(func, FunctionType):
+        return _getargspec(func)
 
-    if inspect.ismethod(func):
-        argspec = inspect.getargspec(func)
+    if isinstance(func, MethodType):
+        argspec = _getargspec(func.__func__)
         argspec[0].pop(0)
         return argspec
 
+    import inspect
+
     def strbetween(s, a, b):
         return s[s.find(a): s.rfind(b)]
 
@@ -62,3 +621,117 @@ def getargspec(func):
     defaultcount = len([d for d in defaultpart.split(',') if d.strip('[]')])
 
     return (args, None, None, (None,) * defaultcount or None)
+
+def _find_loaded_module(path):
+    for module in list(sys.modules.values()):
+        module_path = getattr(module, '__file__', None)
+        if module_path and os.path.abspath(module_path) == path:
+            return module
+    return None
+
+def load_module(target):
+    '''Import `target` as a module name, or load it from a file path.
+
+    A file is loaded by :py:mod:`importlib`, so its compiled bytecode is
+    cached in ``__pycache__`` and reused. If the file is importable by its
+    file name, it is imported by the name. Otherwise, it gets a unique name,
+    so several files can be loaded side by side. A module already imported
+    from the same file is reused.
+
+    :param target: a module name or a file path
+    :type target: str
+    :rtype: module
+
+    .. versionadded:: 0.4
+    '''
+
+    if not os.path.isfile(target):
+        import importlib
+        return importlib.import_module(target)
+
+    path = os.path.abspath(target)
+
+    module = _find_loaded_module(path)
+    if module is not None:
+        return module
+
+    try:
+        import importlib.util
+        from importlib.machinery import SourceFileLoader
+    except ImportError:
+        SourceFileLoader = None
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    if SourceFileLoader is not None and name.isidentifier() and name not in sys.modules:
+        spec = importlib.util.find_spec(name)
+        if spec is not None and spec.origin and os.path.abspath(spec.origin) == path:
+            return importlib.import_module(name)
+
+    return _load_source(path)
+
+def _load_source(path):
+    # load the file `path` into a new module with a unique name
+
+    try:
+        import importlib.util
+        from importlib.machinery import SourceFileLoader
+    except ImportError:
+        SourceFileLoader = None
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    unique_name = '_clime_%s' % name
+    i = 1
+    while unique_name in sys.modules:
+        i += 1
+        unique_name = '_clime_%s_%d' % (name, i)
+
+    if SourceFileLoader is None:
+        # Python 2
+        import imp
+        return imp.load_source(unique_name, path)
+
+    # a file without the .py suffix needs the loader explicitly
+    loader = SourceFileLoader(unique_name, path)
+    spec = importlib.util.spec_from_file_location(unique_name, path, loader=loader)
+    module = importlib.util.module_from_spec(spec)
+
+    sys.modules[unique_name] = module
+    try:
+        loader.exec_module(module)
+    except BaseException:
+        del sys.modules[unique_name]
+        raise
+
+    return module
+
+def reload_module(module):
+    '''Reload `module` and return the new one.
+
+    A module which isn't imported by its name, such as the ``__main__`` of a
+    script, can't be reloaded by `importlib`. Its source is executed again
+    into a new module, which has a unique name like the files loaded by
+    :py:func:`load_module`, so the ``if __name__ == '__main__':`` block
+    doesn't run again.
+
+    :param module: a module
+    :type module: module
+    :rtype: module
+
+    .. versionadded:: 0.4
+    '''
+
+    try:
+        from importlib import reload
+    except ImportError:
+        # Python 2
+        from __builtin__ import reload
+
+    if sys.version_info[0] >= 3 and (
+        module.__name__ == '__main__' or getattr(module, '__spec__', None) is None
+    ):
+        from .cache import get_source_path
+        path = get_source_path(module)
+        if path is not None:
+            return _load_source(os.path.abspath(path))
+
+    return reload(module)
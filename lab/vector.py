@@ -5,8 +5,8 @@ def dot(x, y):
     '''calculate a dot product for vectors
 
     options:
-        -x SCALARS...  x vector
-        -y SCALARS...  y vector
+        -x <float[]>  x vector, such as 1,2,3
+        -y <float[]>  y vector, such as 4,5,6
     '''
     return sum(map(mul, x, y))
 
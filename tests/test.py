@@ -1,17 +1,159 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import os
+import sys
+import time
+import array
+import errno
+import shutil
+import socket
+import subprocess
+import tempfile
 import unittest
-from clime import Command
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+from clime import Command, Program
 from clime.util import *
 
+def iter_items():
+    yield 'a'
+    yield b'b'
+    yield 1
+
+def collect(name=None, *items):
+    return '%s %r' % (name, items)
+
+def total(*numbers):
+    numbers, = numbers
+    return sum(numbers)
+
 class TestClime(unittest.TestCase):
 
     def test_util_autotype(self):
-        cases   = ('string', '100', '100.0', None)
-        answers = ('string',  100 ,  100.0 , None)
+        cases   = ('string', '100', '100.0', None, '-3', '-.5', '1e3', 'true', 'False', 'null', '1a', '')
+        answers = ('string',  100 ,  100.0 , None,  -3 ,  -.5 ,  1e3 ,  True ,  False ,  None , '1a', '')
         for case, answer in zip(cases, answers):
             self.assertEqual(autotype(case), answer)
+            self.assertEqual(type(autotype(case)), type(answer))
+        self.assertEqual(autotype_all(cases), list(answers))
+
+        self.assertEqual(autotype('+7'), 7)
+        self.assertEqual(autotype('-2.5e1'), -25.0)
+        self.assertEqual(autotype('-Infinity'), float('-inf'))
+        self.assertEqual(autotype('NaN') != autotype('NaN'), True)
+        self.assertEqual(autotype('.hidden'), '.hidden')
+        self.assertEqual(autotype('-v'), '-v')
+        self.assertEqual(autotype('nothing'), 'nothing')
+
+    def test_util_array_caster(self):
+
+        self.assertIsNone(ArrayCaster.from_meta('int'))
+        self.assertIsNone(ArrayCaster.from_meta('str[]'))
+        self.assertEqual(ArrayCaster.from_meta('float64[]').typecode, 'd')
+        self.assertEqual(ArrayCaster.from_meta('f32...').typecode, 'f')
+
+        prefer_numpy = ArrayCaster.prefer_numpy
+        ArrayCaster.prefer_numpy = False
+        self.addCleanup(setattr, ArrayCaster, 'prefer_numpy', prefer_numpy)
+
+        caster = ArrayCaster.from_meta('int[]')
+        self.assertEqual(caster('1,2,3'), array.array('q', [1, 2, 3]))
+        self.assertEqual(caster.cast_all(['1', '2,3']), array.array('q', [1, 2, 3]))
+        self.assertEqual(caster.cast_all([]), array.array('q'))
+        self.assertEqual(caster.cast_all(['1,', ',2']), array.array('q', [1, 2]))
+
+        from clime import ParseError
+        with self.assertRaises(ParseError) as cm:
+            caster('1,2,,3')
+        self.assertEqual(str(cm.exception), "invalid element 2 of the int array: ''")
+        with self.assertRaises(ParseError) as cm:
+            ArrayCaster.from_meta('i8[]').cast_all(['1', '2,300'])
+        self.assertEqual(str(cm.exception), "invalid element 2 of the int array: '300'")
+
+        ArrayCaster.prefer_numpy = True
+        numpy = ArrayCaster.get_numpy()
+        if numpy is not None:
+            self.assertEqual(caster.cast_all(['1', '2,3']).tolist(), [1, 2, 3])
+            self.assertEqual(caster.cast_all(['1', '2,3']).dtype, numpy.dtype('q'))
+            self.assertEqual(caster.cast_all([]).tolist(), [])
+            with self.assertRaises(ParseError) as cm:
+                caster.cast_all(['1', '2.5'])
+            self.assertEqual(str(cm.exception), "invalid element 1 of the int array: '2.5'")
+        ArrayCaster.prefer_numpy = False
+
+        def dot(x, *y):
+            '''
+            -x <float[]>
+            -y <float...>
+            '''
+            y, = y
+            return sum(a*b for a, b in zip(x, y))
+
+        self.assertEqual(Command(dot).execute('1,2,3 4 5 6'), 32.0)
+
+    def test_util_file_payload(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+
+        json_path = os.path.join(dir_path, 'payload.json')
+        with open(json_path, 'w') as f:
+            f.write('{"xs": [1, 2, 3]}')
+
+        self.assertIs(get_json_backend(), get_json_backend())
+        self.assertEqual(json('[1, 2]'), [1, 2])
+        self.assertEqual(json('@'+json_path), {'xs': [1, 2, 3]})
+
+        payload = map_bytes('@'+json_path)
+        self.assertEqual(payload[:6], b'{"xs":')
+        payload.close()
+        self.assertEqual(map_bytes('abc'), b'abc')
+        self.assertEqual(map_bytes('@@abc'), b'@abc')
+
+        def size(data, payload=None, stream=None):
+            '''
+            --data=<json>
+            --data=<json>
+            --data=<json>
+            --payload=<bytes>
+            --stream=<file>
+            '''
+            if stream is not None:
+                with stream:
+                    return len(stream.read())
+            return len(data['xs']) + len(payload or b'')
+
+        self.assertEqual(Command(size).execute(['@'+json_path]), 3)
+        self.assertEqual(Command(size).execute(['{"xs": []}', '--payload', '@'+json_path]), 17)
+        self.assertEqual(Command(size).execute(['0', '--stream', json_path]), 17)
+
+    def test_util_load_module(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+
+        paths = []
+        for sub_dir_name in ('a', 'b'):
+            os.mkdir(os.path.join(dir_path, sub_dir_name))
+            path = os.path.join(dir_path, sub_dir_name, 'side_by_side_tool')
+            with open(path, 'w') as f:
+                f.write('NAME = %r\n' % sub_dir_name)
+            paths.append(path)
+
+        a, b = [load_module(path) for path in paths]
+        for module in (a, b):
+            self.addCleanup(sys.modules.pop, module.__name__, None)
+
+        self.assertEqual((a.NAME, b.NAME), ('a', 'b'))
+        self.assertNotEqual(a.__name__, b.__name__)
+        self.assertIs(load_module(paths[0]), a)
+        self.assertIs(load_module('os.path'), os.path)
+
+        if not sys.dont_write_bytecode:
+            self.assertTrue(os.listdir(os.path.join(dir_path, 'a', '__pycache__')))
 
     def test_util_getargspec(self):
 
@@ -50,6 +192,35 @@ class TestClime(unittest.TestCase):
             f.__doc__ = doc
             self.assertEqual(trans(getargspec(f)), answer)
 
+    def test_import_budget(self):
+
+        script = '''if 1:
+            import sys
+            before = set(sys.modules)
+
+            import clime
+            print(' '.join(sorted(set(sys.modules) - before)))
+
+            def add(x, y=1):
+                """
+                -y <int>
+                """
+                return x + y
+
+            clime.Program({'add': add}, name='add').main(['add', '1', '-y', '2'])
+            print(' '.join(sorted(set(sys.modules) - before)))
+        '''
+
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.check_output([sys.executable, '-c', script], env=env)
+        imported, result, executed_imported = output.decode('ascii').splitlines()
+
+        self.assertEqual(result, '3')
+        for name in ('inspect', 're', 'collections', 'ast', 'mmap', 'array', 'json'):
+            self.assertNotIn(name, imported.split())
+        for name in ('inspect', 'ast', 'mmap', 'array', 'json'):
+            self.assertNotIn(name, executed_imported.split())
+
     def test_command_arg_re(self):
 
         cases = [
@@ -69,5 +240,785 @@ class TestClime(unittest.TestCase):
         for case in cases:
             self.assertEqual(Command.arg_re.match(case).group('key', 'meta'), ('k', 'meta'))
 
+    def test_command_parse(self):
+
+        def repeat(message, times=2, count=False, *args):
+            '''
+            -m=<str>, --message=<str>
+            -t=<int>, --times=<int>
+            -c, --count
+            '''
+
+        cmd = Command(repeat)
+
+        raw_args = ['-tttc', 'Hi!']
+        self.assertEqual(cmd.parse(raw_args), (['Hi!'], {'times': 3, 'count': True}))
+        self.assertEqual(raw_args, ['-tttc', 'Hi!'])
+
+        raw_args = ['Hi!'] + [str(i) for i in range(10000)]
+        pargs, kargs = cmd.parse(raw_args)
+        self.assertEqual(pargs, ['Hi!', 2, False] + list(range(10000)))
+        self.assertEqual(kargs, {})
+
+    def test_command_spec(self):
+
+        def add(x, y=1):
+            '''
+            -y <int>
+            '''
+            return x + y
+
+        cmd = Command(add, 'add')
+        other_cmd = Command(add, 'plus', stream_varargs=True)
+        self.assertIs(cmd.spec, other_cmd.spec)
+        self.assertEqual(other_cmd.build_usage(), 'plus [-y <int>] <x>')
+        self.assertEqual(other_cmd.execute('1 -y 2'), 3)
+        self.assertRaises(AttributeError, setattr, cmd, 'foo', 1)
+
+        # a copied spec changes one command only
+        other_cmd.spec = other_cmd.spec.copy()
+        other_cmd.arg_meta_map['y'] = '<str>'
+        other_cmd.compile()
+        self.assertEqual(other_cmd.parse('1 -y 2'), ([1], {'y': '2'}))
+        self.assertEqual(cmd.parse('1 -y 2'), ([1], {'y': 2}))
+
+        Command.drop_spec(add)
+        self.assertIsNot(Command(add).spec, cmd.spec)
+
+        # the bound methods of a function share a spec
+        class Adder(object):
+            def add(self, x, y=1):
+                return x + y
+        self.assertIs(Command(Adder().add).spec, Command(Adder().add).spec)
+        self.assertEqual(Command(Adder().add).arg_names, ('x', 'y'))
+
+    def test_command_stream_varargs(self):
+
+        def total(start=0, *numbers):
+            '''
+            --start <int>
+            --numbers <int>
+            '''
+            numbers, = numbers
+            return start + sum(numbers)
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        path = os.path.join(dir_path, 'numbers.txt')
+        with open(path, 'w') as f:
+            f.write(''.join('%d\n' % i for i in range(1000)))
+
+        cmd = Command(total, stream_varargs=True)
+        pargs, kargs = cmd.parse(['--start=1', '2', '@'+path])
+        self.assertEqual(len(pargs), 2)
+        self.assertEqual(pargs[0], 1)
+        self.assertEqual(next(pargs[1]), 2)
+        self.assertEqual(next(pargs[1]), 0)
+        self.assertEqual(sum(pargs[1]), sum(range(1, 1000)))
+
+        self.assertEqual(cmd.execute(['1', '2', '@'+path]), 3 + sum(range(1000)))
+
+        # no varargs is still one iterator
+        pargs, kargs = cmd.parse([])
+        self.assertEqual(pargs[0], 0)
+        self.assertEqual(list(pargs[1]), [])
+        self.assertEqual(kargs, {})
+        self.assertEqual(cmd.execute(['--start=1']), 1)
+        self.assertEqual(cmd.execute(['1']), 1)
+
+    def test_command_response_files(self):
+
+        from clime.response import tokenize, expand
+
+        self.assertEqual(
+            list(tokenize(b'''a "b c" 'd "e"' f\\ g # a comment
+                h#i "j\\"k" l\\
+m ''')),
+            ['a', 'b c', 'd "e"', 'f g', 'h#i', 'j"k', 'lm']
+        )
+        self.assertEqual(list(tokenize(b'--x \\\n  --y \\\n')), ['--x', '--y'])
+        self.assertRaises(ValueError, list, tokenize(b'a "b'))
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        path = os.path.join(dir_path, 'args.txt')
+        with open(path, 'w') as f:
+            f.write('--name "Mosky Liu" \\\n# the items\n1 2.5 \'three four\'\n')
+
+        expanded = expand(['x', '@'+path, '@@y'])
+        self.assertEqual(next(expanded), 'x')
+        self.assertEqual(list(expanded), ['--name', 'Mosky Liu', '1', '2.5', 'three four', '@y'])
+
+        def collect(name=None, *items):
+            return name, items
+
+        cmd = Command(collect, response_files=True)
+        self.assertEqual(cmd.execute(['@'+path, '5']), ('Mosky Liu', (1, 2.5, 'three four', 5)))
+        self.assertEqual(cmd.execute(['@@'+path]), (None, ('@'+path, )))
+        self.assertEqual(Command(collect).execute(['@'+path]), (None, ('@'+path, )))
+
+    def test_program_get_command(self):
+
+        def hi(name):
+            return 'Hi, %s!' % name
+
+        def bye(name):
+            return 'Bye, %s!' % name
+
+        prog = Program({'hi': hi, 'bye': bye})
+        self.assertEqual(prog.commands, {})
+
+        cmd = prog.get_command('hi')
+        self.assertIs(prog.get_command('hi'), cmd)
+        self.assertEqual(list(prog.commands), ['hi'])
+
+        prog.build_commands()
+        self.assertEqual(sorted(prog.commands), ['bye', 'hi'])
+
+        prog.drop_commands(['hi'])
+        self.assertEqual(list(prog.commands), ['bye'])
+        prog.drop_commands()
+        self.assertEqual(prog.commands, {})
+
+    def test_program_prefix(self):
+
+        from clime import ParseError
+
+        def deploy(target, verbose=False, version=None, dry_run=False):
+            '''
+            -v, --verbose
+            --dry-run
+            '''
+            return (target, verbose, version, dry_run)
+
+        def describe(target):
+            return target
+
+        prog = Program({'deploy': deploy, 'describe': describe, 'status': describe})
+        self.assertEqual(prog.lookup('dep'), 'deploy')
+        self.assertEqual(prog.lookup('s'), 'status')
+        self.assertIsNone(prog.lookup('x'))
+        with self.assertRaises(ParseError) as cm:
+            prog.lookup('de')
+        self.assertEqual(cm.exception.candidates, ['deploy', 'describe'])
+
+        raw_args = ['dep', '--verb', 'prod']
+        self.assertEqual(prog.route(raw_args), ('deploy', False))
+        self.assertEqual(prog.get_command('deploy').execute(raw_args), ('prod', True, None, False))
+        self.assertEqual(prog.execute(['dep', '--dry', '--versi=2', 'prod']), ('prod', False, 2, True))
+        self.assertRaises(ParseError, prog.execute, ['dep', '--ve', 'prod'])
+
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            with self.assertRaises(SystemExit) as cm:
+                prog.run(['de', 'prod'])
+            self.assertEqual(cm.exception.code, 2)
+            self.assertIn("ambiguous command 'de': deploy, describe", sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
+        # a prefix may be an argument of the default command
+        prog = Program({'deploy': deploy, 'describe': describe}, default='describe')
+        self.assertEqual(prog.execute(['dep']), 'dep')
+
+        # a new keyword isn't completed
+        def collect(**kargs):
+            return kargs
+        self.assertEqual(Program({'collect': collect}).execute(['--ver=1']), {'ver': 1})
+
+    def test_program_suggest(self):
+
+        from clime import ParseError
+
+        index = NgramIndex(['status', 'state', 'deploy', 'describe'])
+        self.assertEqual(index.find('stauts'), [(1, 'status')])
+        self.assertEqual(index.find('deplyo', 1), [(1, 'deploy')])
+        self.assertEqual(edit_distance('deplyo', 'deploy'), 1)
+
+        calls = []
+
+        def deploy(target, verbose=False, dry_run=False):
+            '''
+            --dry-run
+            '''
+            calls.append(target)
+
+        prog = Program({'deploy': deploy, 'describe': deploy, 'status': deploy})
+        self.assertEqual(prog.suggest('deplyo'), ['deploy'])
+        self.assertEqual(prog.suggest('zzz'), [])
+
+        with self.assertRaises(ParseError) as cm:
+            prog.execute(['statsu', 'prod'])
+        self.assertEqual(str(cm.exception), "unknown command 'statsu'; did you mean: status?")
+        self.assertEqual(cm.exception.candidates, ['status'])
+
+        # an unknown option fails before the rest of the arguments are read
+        raw_args = iter(['--verbsoe', 'prod', '--dry-run'])
+        with self.assertRaises(ParseError) as cm:
+            prog.get_command('deploy').execute(raw_args)
+        self.assertEqual(str(cm.exception), 'unknown option --verbsoe; did you mean: --verbose?')
+        self.assertEqual(list(raw_args), ['--dry-run'])
+        self.assertRaises(ParseError, prog.get_command('deploy').execute, ['-x', 'prod'])
+        self.assertEqual(calls, [])
+
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            with self.assertRaises(SystemExit) as cm:
+                prog.main(['deploy', '--dryrun', 'prod'])
+            self.assertEqual(cm.exception.code, 2)
+            self.assertIn('did you mean: --dry-run?', sys.stderr.getvalue())
+        finally:
+            sys.stderr = stderr
+
+    def test_program_cache(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        with open(os.path.join(dir_path, 'cached_mod.py'), 'w') as f:
+            f.write(
+                'def repeat(message, times=2):\n'
+                '    """\n'
+                '    -t=<int>, --times=<int>\n'
+                '    """\n'
+                '    return message * times\n'
+            )
+
+        sys.path.insert(0, dir_path)
+        self.addCleanup(sys.path.remove, dir_path)
+        import cached_mod
+        self.addCleanup(sys.modules.pop, 'cached_mod')
+
+        prog = Program(cached_mod, cache=True)
+        self.assertEqual(prog.command_metas, {})
+        usage = prog.get_command('repeat').build_usage()
+
+        prog = Program(cached_mod, cache=True)
+        self.assertEqual(list(prog.command_metas), ['repeat'])
+        cmd = prog.get_command('repeat')
+        self.assertEqual(cmd.build_usage(), usage)
+        self.assertEqual(cmd.execute('-t3 Hi!'), 'Hi!Hi!Hi!')
+
+        help_text = prog.build_help()
+        self.assertTrue(help_text.startswith('usage: [-t <int> | --times=<int>] <message>\n'))
+        self.assertIs(prog.build_help(), help_text)
+
+        # the help text is taken from the cache without building the commands
+        prog = Program(cached_mod, cache=True)
+        self.assertEqual(prog.build_help(), help_text)
+        self.assertEqual(prog.commands, {})
+
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            prog.print_usage()
+            self.assertEqual(sys.stdout.getvalue(), help_text)
+        finally:
+            sys.stdout = stdout
+
+        # a different doc is another help text
+        prog = Program(cached_mod, cache=True, doc='It repeats.')
+        self.assertTrue(prog.build_help().endswith('\nIt repeats.\n\n'))
+
+    def test_program_cache_deps(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        dep_path = os.path.join(dir_path, 'cached_dep.py')
+        with open(dep_path, 'w') as f:
+            f.write(
+                'def repeat(message, times=2):\n'
+                '    return message * times\n'
+            )
+        with open(os.path.join(dir_path, 'cached_main.py'), 'w') as f:
+            f.write('from cached_dep import repeat\n')
+
+        sys.path.insert(0, dir_path)
+        self.addCleanup(sys.path.remove, dir_path)
+        import cached_main
+        self.addCleanup(sys.modules.pop, 'cached_main')
+        self.addCleanup(sys.modules.pop, 'cached_dep')
+
+        prog = Program(cached_main, cache=True)
+        self.assertEqual(prog.get_command('repeat').build_usage(), 'repeat [--times=2] <message>')
+        prog = Program(cached_main, cache=True)
+        self.assertEqual(list(prog.command_metas), ['repeat'])
+
+        # the imported function is changed
+        with open(dep_path, 'w') as f:
+            f.write(
+                'def repeat(message, times=2):\n'
+                '    """\n'
+                '    -t=<int>, --times=<int>\n'
+                '    """\n'
+                '    return message * times\n'
+            )
+        stat = os.stat(dep_path)
+        os.utime(dep_path, (stat.st_atime, stat.st_mtime+1))
+        try:
+            from importlib import reload
+        except ImportError:
+            # Python 2
+            from __builtin__ import reload
+        import cached_dep
+        cached_main.repeat = reload(cached_dep).repeat
+
+        prog = Program(cached_main, cache=True)
+        self.assertEqual(prog.command_metas, {})
+        self.assertEqual(prog.get_command('repeat').build_usage(), 'repeat [-t <int> | --times=<int>] <message>')
+
+        # the information of a changed signature is stale, so it introspects
+        def echo(message):
+            return message
+        meta = Command(echo).dump_meta()
+        def echo(message, times=2):
+            return message * times
+        self.assertEqual(Command(echo, meta=meta).execute('Hi! --times=3'), 'Hi!Hi!Hi!')
+
+    def test_program_profile(self):
+
+        def spin(n=1000):
+            '''
+            -n <int>
+            '''
+            return sum(i*i for i in range(n))
+
+        def ticks(n=3):
+            '''
+            -n <int>
+            '''
+            for i in range(n):
+                yield i
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        path = os.path.join(dir_path, 'spin.pstats')
+
+        prog = Program({'spin': spin, 'ticks': ticks}, debug=True)
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            prog.main(['--clime-profile', path, 'spin', '-n', '10'])
+            prog.main(['--clime-profile=-', '--clime-profile-top=5', 'ticks'])
+            output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+        import pstats
+        self.assertTrue(pstats.Stats(path).total_tt > 0)
+
+        self.assertEqual(output, '285\n0\n1\n2\n')
+        self.assertIn('command (spin)', errors)
+        self.assertIn('command (ticks)', errors)
+        self.assertIn('clime overhead', errors)
+        self.assertIn('due to restriction <5>', errors)
+
+    def test_program_tracer(self):
+
+        from clime.tracing import SummaryTracer
+
+        def add(x, y=1):
+            '''
+            -x <int>
+            -y <int>
+            '''
+            return x + y
+
+        spans = []
+        summary = StringIO()
+        tracer = SummaryTracer(spans.append, file=summary)
+        prog = Program({'add': add}, tracer=tracer)
+
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            prog.main(['add', '1', '-y', '2'])
+            prog.main(['add', '2'])
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+
+        self.assertEqual(output, '3\n3\n')
+        self.assertEqual(
+            [span.phase for span in spans],
+            ['discover', 'lookup', 'build', 'cast', 'parse', 'execute', 'output',
+                         'lookup',          'cast', 'parse', 'execute', 'output']
+        )
+        self.assertTrue(all(span.end >= span.start for span in spans))
+        self.assertEqual(spans[3].info, {'command': 'add'})
+
+        tracer.print_summary()
+        self.assertIn('build           1', summary.getvalue())
+        self.assertIn('parse           2', summary.getvalue())
+
+        self.assertIsNone(Command(add).tracer)
+
+        def total(start=0, *numbers):
+            '''
+            --start <int>
+            --numbers <int>
+            '''
+            return start + sum(numbers)
+
+        spans = []
+        prog = Program({'total': total}, tracer=SummaryTracer(spans.append, file=summary))
+        self.assertEqual(prog.execute(['total', '1', '2', '3']), 6)
+
+        span_map = dict((span.phase, span) for span in spans)
+        cast_span = span_map['cast']
+        parse_span = span_map['parse']
+        self.assertTrue(all(0 <= span.duration < 10 for span in spans))
+        self.assertTrue(parse_span.start <= cast_span.start <= cast_span.end <= parse_span.end)
+
+    def test_completion_build_script(self):
+
+        from clime.completion import build_script
+
+        def repeat(message, times=2, count=False):
+            '''
+            -t=<int>, --times=<int>
+            -c, --count
+            '''
+
+        prog = Program({'repeat': repeat, 'hi': lambda: None})
+
+        script = build_script(prog, 'prog', 'bash')
+        self.assertIn("'') words='hi repeat --help' ;;", script)
+        self.assertIn("'repeat') words='--message --times --count -c -t' ;;", script)
+        self.assertIn("complete -o default -F _clime_prog 'prog'", script)
+
+        script = build_script(prog, 'prog', 'fish')
+        self.assertIn("complete -c 'prog' -n '__fish_seen_subcommand_from repeat' -l 'count'\n", script)
+
+        self.assertRaises(ValueError, build_script, prog, 'prog', 'csh')
+
+    def test_freeze(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+
+        source_path = os.path.join(dir_path, 'frozen_add.py')
+        frozen_path = os.path.join(dir_path, 'frozen_add_cli.py')
+        with open(source_path, 'w') as f:
+            f.write('''
+def add(x, y=1):
+    """
+    -y <int>
+    """
+    return x + y
+''')
+
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([dir_path]+sys.path))
+
+        def clime(*args):
+            return subprocess.check_output(
+                [sys.executable, '-W', 'ignore', '-m', 'clime'] + list(args),
+                env=env
+            ).decode('ascii')
+
+        def run(*args):
+            return subprocess.check_output(
+                [sys.executable, frozen_path] + list(args),
+                env=env
+            ).decode('ascii')
+
+        self.assertEqual(clime('freeze', source_path, '-o', frozen_path), frozen_path+'\n')
+        with open(frozen_path) as f:
+            frozen = f.read()
+        self.assertIn("'usage': '[-y <int>] <x>'", frozen)
+
+        self.assertEqual(run('1', '-y', '2'), '3\n')
+        self.assertIn('usage: [-y <int>] <x>', run('--help'))
+
+        # the source is changed, so it runs the source and freezes it again
+        with open(source_path, 'a') as f:
+            f.write('\ndef sub(x, y):\n    return x - y\n')
+        self.assertEqual(run('sub', '3', '2'), '1\n')
+        with open(frozen_path) as f:
+            self.assertIn("'sub'", f.read())
+
+        # a command imported from another module is changed
+        dep_path = os.path.join(dir_path, 'frozen_dep.py')
+        main_path = os.path.join(dir_path, 'frozen_main.py')
+        frozen_path = os.path.join(dir_path, 'frozen_main_cli.py')
+        with open(dep_path, 'w') as f:
+            f.write('def repeat(message):\n    return message * 2\n')
+        with open(main_path, 'w') as f:
+            f.write('from frozen_dep import repeat\n')
+
+        self.assertEqual(clime('freeze', main_path, '-o', frozen_path), frozen_path+'\n')
+        self.assertEqual(run('ab'), 'abab\n')
+
+        with open(dep_path, 'w') as f:
+            f.write(
+                'def repeat(message, sep="-"):\n'
+                '    return message + sep + message\n'
+            )
+        stat = os.stat(dep_path)
+        os.utime(dep_path, (stat.st_atime, stat.st_mtime+1))
+        self.assertEqual(run('ab'), 'ab-ab\n')
+        self.assertIn("usage: [--sep='-'] <message>", run('--help'))
+
+    def test_program_run_batch(self):
+
+        def add(x, y=1):
+            '''
+            -x <int>
+            -y <int>
+            '''
+            return x + y
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        path = os.path.join(dir_path, 'batch.txt')
+        with open(path, 'w') as f:
+            f.write('add 1\n# a comment\n\nadd 1 -y 2\nadd one\nadd "2" --y=3\n')
+
+        prog = Program({'add': add, 'sub': lambda x, y: x - y})
+
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout, sys.stderr = StringIO(), StringIO()
+        try:
+            ok = prog.run_batch(path)
+            output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+        self.assertFalse(ok)
+        self.assertEqual(output, '2\n3\n5\n')
+        self.assertIn('line 5: exception: ValueError', errors)
+
+    def test_program_run_batch_jobs(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        path = os.path.join(dir_path, 'batch.txt')
+        with open(path, 'w') as f:
+            f.write(''.join('join a%d b\n' % i for i in range(20)))
+            f.write('join\n')
+
+        expected = ''.join('a%d/b\n' % i for i in range(20))
+
+        for threads in (False, True):
+
+            prog = Program({'join': os.path.join, 'split': os.path.split})
+
+            stdout, stderr = sys.stdout, sys.stderr
+            sys.stdout, sys.stderr = StringIO(), StringIO()
+            try:
+                ok = prog.run_batch(path, jobs=3, threads=threads)
+                output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+            finally:
+                sys.stdout, sys.stderr = stdout, stderr
+
+            self.assertFalse(ok)
+            self.assertEqual(output, expected)
+            self.assertIn('line 21: exception: TypeError', errors)
+
+        # the workers build the commands with the options of the program
+        args_path = os.path.join(dir_path, 'args.txt')
+        with open(args_path, 'w') as f:
+            f.write('--name "Mosky Liu" 1 2\n')
+        with open(path, 'w') as f:
+            f.write(''.join('collect @%s %d\n' % (args_path, i) for i in range(5)))
+            f.write('total 1 2 3\n')
+
+        expected = ''.join("Mosky Liu (1, 2, %d)\n" % i for i in range(5)) + '6\n'
+
+        for threads in (False, True):
+
+            prog = Program(
+                {'collect': collect, 'total': total},
+                response_files=['collect'], stream_varargs=['total']
+            )
+
+            stdout, stderr = sys.stdout, sys.stderr
+            sys.stdout, sys.stderr = StringIO(), StringIO()
+            try:
+                ok = prog.run_batch(path, jobs=2, threads=threads)
+                output, errors = sys.stdout.getvalue(), sys.stderr.getvalue()
+            finally:
+                sys.stdout, sys.stderr = stdout, stderr
+
+            self.assertEqual(errors, '')
+            self.assertTrue(ok)
+            self.assertEqual(output, expected)
+
+    def test_output_writer(self):
+
+        from clime.output import Writer, BrokenPipe
+
+        buf = StringIO()
+        Writer(buf).write_return(iter_items())
+        self.assertEqual(buf.getvalue(), 'a\nb\n1\n')
+
+        buf = StringIO()
+        Writer(buf).write_return(['a', 1])
+        self.assertEqual(buf.getvalue(), "['a', 1]\n")
+
+        # an idle producer gets its items flushed while it stalls
+        buf = StringIO()
+        seen = []
+        def stall():
+            yield 'A'
+            time.sleep(0.5)
+            seen.append(buf.getvalue())
+            yield 'B'
+        Writer(buf, flush=0.1).write_return(stall())
+        self.assertEqual(seen, ['A\n'])
+        self.assertEqual(buf.getvalue(), 'A\nB\n')
+
+        class PipeStream(object):
+            def write(self, s):
+                raise IOError(errno.EPIPE, 'Broken pipe')
+            def flush(self):
+                pass
+
+        closed = []
+        def rows():
+            try:
+                while True:
+                    yield 'row'
+            finally:
+                closed.append(True)
+
+        writer = Writer(PipeStream(), buffer_size=10)
+        self.assertRaises(BrokenPipe, writer.write_return, rows())
+        self.assertEqual(closed, [True])
+
+    @unittest.skipIf(sys.version_info < (3, ), 'requires Python 3')
+    def test_command_kwonly_args(self):
+
+        from clime import ParseError
+
+        namespace = {}
+        exec(
+            'def deploy(target, *, verbose=False, n=1, tag):\n'
+            '    """\n'
+            '    -v, --verbose\n'
+            '    -n=<int>\n'
+            '    """\n'
+            '    return target, verbose, n, tag\n',
+            namespace
+        )
+        deploy = namespace['deploy']
+
+        cmd = Command(deploy)
+        self.assertEqual(cmd.kwonlyarg_names, ('verbose', 'n', 'tag'))
+        self.assertEqual(cmd.execute(['prod', '--n=3', '--tag=x']), ('prod', False, 3, 'x'))
+        self.assertEqual(cmd.execute('prod -vn 2 --tag y'), ('prod', True, 2, 'y'))
+        self.assertEqual(cmd.execute('prod --verb --tag=z'), ('prod', True, 1, 'z'))
+        self.assertEqual(cmd.build_usage(), 'deploy [-v | --verbose] [-n <int>] --tag=<value> <target>')
+
+        with self.assertRaises(ParseError) as cm:
+            cmd.execute('prod --verbsoe --tag=x')
+        self.assertEqual(str(cm.exception), 'unknown option --verbsoe; did you mean: --verbose?')
+
+        # the cached information keeps them
+        meta = cmd.dump_meta()
+        Command.drop_spec(deploy)
+        self.assertEqual(Command(deploy, meta=meta).execute('prod -n 4 --tag=x'), ('prod', False, 4, 'x'))
+
+    @unittest.skipIf(sys.version_info < (3, 6), 'requires Python 3.6')
+    def test_async_command(self):
+
+        from clime.output import Writer
+
+        namespace = {}
+        exec(
+            'import asyncio\n'
+            'async def wait(n):\n'
+            '    """\n'
+            '    -n <int>\n'
+            '    """\n'
+            '    await asyncio.sleep(0)\n'
+            '    return n * 2\n'
+            'async def count(n):\n'
+            '    """\n'
+            '    -n <int>\n'
+            '    """\n'
+            '    for i in range(n):\n'
+            '        await asyncio.sleep(0)\n'
+            '        yield i\n',
+            namespace
+        )
+
+        self.assertEqual(Command(namespace['wait']).execute('21'), 42)
+
+        buf = StringIO()
+        Writer(buf).write_return(Command(namespace['count']).execute('3'))
+        self.assertEqual(buf.getvalue(), '0\n1\n2\n')
+
+    @unittest.skipUnless(hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX'), 'requires fork and Unix domain sockets')
+    def test_server(self):
+
+        dir_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir_path)
+        path = os.path.join(dir_path, 'prog.sock')
+
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'clime', 'posixpath', '--clime-serve', path],
+            env=env
+        )
+        self.addCleanup(server.wait)
+        self.addCleanup(server.terminate)
+
+        for _ in range(100):
+            if os.path.exists(path): break
+            time.sleep(0.05)
+
+        client = subprocess.Popen(
+            [sys.executable, '-m', 'clime.client', path, 'join', 'a', 'b'],
+            stdout=subprocess.PIPE, env=env
+        )
+        output, _ = client.communicate()
+        self.assertEqual(client.returncode, 0)
+        self.assertEqual(output.decode('utf-8'), 'a/b\n')
+
+        # a script which calls start is reloaded after it is changed
+        script_path = os.path.join(dir_path, 'hi.py')
+        script_source = (
+            'def hi():\n'
+            '    return %r\n'
+            'if __name__ == "__main__":\n'
+            '    import clime\n'
+            '    clime.start()\n'
+        )
+        with open(script_path, 'w') as f:
+            f.write(script_source % 'v1')
+
+        path = os.path.join(dir_path, 'hi.sock')
+        server = subprocess.Popen(
+            [sys.executable, script_path, '--clime-serve', path],
+            env=env
+        )
+        self.addCleanup(server.wait)
+        self.addCleanup(server.terminate)
+
+        for _ in range(100):
+            if os.path.exists(path): break
+            time.sleep(0.05)
+
+        def request():
+            client = subprocess.Popen(
+                [sys.executable, '-m', 'clime.client', path, 'hi'],
+                stdout=subprocess.PIPE, env=env
+            )
+            output, _ = client.communicate()
+            self.assertEqual(client.returncode, 0)
+            return output.decode('utf-8')
+
+        self.assertEqual(request(), 'v1\n')
+
+        with open(script_path, 'w') as f:
+            f.write(script_source % 'v2.0')
+        stat = os.stat(script_path)
+        os.utime(script_path, (stat.st_atime, stat.st_mtime+1))
+
+        self.assertEqual(request(), 'v2.0\n')
+
 if __name__ == '__main__':
     unittest.main()